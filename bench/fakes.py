@@ -0,0 +1,181 @@
+"""Lokale Stellvertreter für iCloud, OpenAI-TTS und das Aufnahme-Laufwerk (nur für bench.run)."""
+import os
+import time
+import shutil
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+BENCH_ICLOUD_LATENCY = float(os.getenv("BENCH_ICLOUD_LATENCY", "0.2"))  # Sekunden pro iCloud-Aufruf
+BENCH_TTS_FIRST_CHUNK = float(os.getenv("BENCH_TTS_FIRST_CHUNK", "0.3"))  # Sekunden bis zum ersten Chunk
+BENCH_TTS_CHUNKS = int(os.getenv("BENCH_TTS_CHUNKS", "20"))
+BENCH_TTS_CHUNK_SIZE = 4096
+BENCH_TTS_CHUNK_DELAY = float(os.getenv("BENCH_TTS_CHUNK_DELAY", "0.01"))
+
+
+# ---- iCloud ---------------------------------------------------------------
+
+class FakeDevice:
+    def __init__(self, index, latency):
+        self.latency = latency
+        self.content = {
+            "id": f"device-{index}",
+            "name": f"Gerät {index}",
+            "deviceDisplayName": "iPhone",
+            "deviceStatus": "200",
+            "batteryLevel": 0.8,
+            "location": {"latitude": 51.2, "longitude": 6.8, "timeStamp": int(time.time() * 1000)},
+        }
+        self.data = self.content
+        self.message_url = "https://example.invalid/message"
+        self.sound_url = "https://example.invalid/sound"
+
+    def __getitem__(self, key):
+        return self.content[key]
+
+    def play_sound(self):
+        time.sleep(self.latency)
+
+
+class FakeDevices:
+    def __init__(self, devices):
+        self._devices = devices
+
+    def __iter__(self):
+        return iter(self._devices)
+
+    def __len__(self):
+        return len(self._devices)
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self._devices[key]
+        return next(d for d in self._devices if d["id"] == key)
+
+
+class FakeCalendar:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def events(self, start, end):
+        time.sleep(self.latency)
+        events = []
+        day = start
+        while day <= end:
+            for hour in (9, 14):
+                events.append({
+                    "guid": f"event-{day:%Y%m%d}-{hour}",
+                    "title": "Termin",
+                    "startDate": [int(f"{day:%Y%m%d}"), day.year, day.month, day.day, hour, 0, 0],
+                    "endDate": [int(f"{day:%Y%m%d}"), day.year, day.month, day.day, hour + 1, 0, 0],
+                })
+            day += timedelta(days=1)
+        return events
+
+
+class FakePyiCloudService:
+    """Ersatz für pyicloud.PyiCloudService mit fester Latenz pro Aufruf, ohne 2FA."""
+
+    requires_2fa = False
+    requires_2sa = False
+    is_trusted_session = True
+
+    def __init__(self, apple_id, password=None, cookie_directory=None, **kwargs):
+        self.latency = BENCH_ICLOUD_LATENCY
+        time.sleep(self.latency)  # Login
+        self._devices = FakeDevices([FakeDevice(i, self.latency) for i in range(3)])
+        self.calendar = FakeCalendar(self.latency)
+
+    @property
+    def devices(self):
+        time.sleep(self.latency)
+        return self._devices
+
+
+# ---- OpenAI TTS -----------------------------------------------------------
+
+def create_tts_app():
+    """Starlette-App mit POST /v1/audio/speech, die Audio-Bytes gestückelt streamt."""
+    from starlette.applications import Starlette
+    from starlette.responses import StreamingResponse
+    from starlette.routing import Route
+
+    async def speech(request):
+        await request.body()
+
+        async def chunks():
+            await asyncio.sleep(BENCH_TTS_FIRST_CHUNK)
+            for _ in range(BENCH_TTS_CHUNKS):
+                yield b"\0" * BENCH_TTS_CHUNK_SIZE
+                await asyncio.sleep(BENCH_TTS_CHUNK_DELAY)
+
+        return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+    return Starlette(routes=[Route("/v1/audio/speech", speech, methods=["POST"])])
+
+
+def start_tts_server(port):
+    """Startet den TTS-Ersatz in einem Hintergrund-Thread und wartet, bis er lauscht."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(create_tts_app(), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="fake-tts", daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+# ---- Aufnahmen ------------------------------------------------------------
+
+def make_template_clip(path, seconds=2, fps=10, width=320, height=240):
+    """Kurzer Testclip (bewegter Farbverlauf) als Vorlage für den synthetischen Baum."""
+    import av
+
+    with av.open(path, "w") as container:
+        try:
+            stream = container.add_stream("libx264", rate=fps)
+        except (ValueError, av.error.FFmpegError):
+            stream = container.add_stream("mpeg4", rate=fps)
+        stream.width, stream.height, stream.pix_fmt = width, height, "yuv420p"
+        for i in range(seconds * fps):
+            frame = av.VideoFrame(width, height, "yuv420p")
+            for index, plane in enumerate(frame.planes):
+                row = bytes((x + i * 8 * (index == 0)) % 256 for x in range(plane.line_size))
+                plane.update(row * (plane.buffer_size // plane.line_size))
+            frame.pts = i
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+
+def make_cctv_tree(base, cameras=4, days=7, clips_per_day=100, template=None):
+    """Legt <base>/<kamera>/<tag>/<kamera>_<yyyymmdd>_<hhmmss>.mp4 an (Hardlinks auf eine Vorlage).
+
+    Liefert die Liste aller Clip-Pfade."""
+    os.makedirs(base, exist_ok=True)
+    # Vorlage neben dem Baum, sonst taucht sie selbst als Aufnahme auf
+    template = template or base.rstrip("/") + ".template.mp4"
+    if not os.path.exists(template):
+        make_template_clip(template)
+
+    paths = []
+    first_day = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days - 1)
+    spacing = timedelta(seconds=86400 // clips_per_day)
+    for c in range(cameras):
+        camera = f"cam{c:02d}"
+        for d in range(days):
+            day = first_day + timedelta(days=d)
+            directory = os.path.join(base, camera, f"{day:%Y-%m-%d}")
+            os.makedirs(directory, exist_ok=True)
+            for i in range(clips_per_day):
+                start = day + spacing * i
+                path = os.path.join(directory, f"{camera}_{start:%Y%m%d_%H%M%S}.mp4")
+                if not os.path.exists(path):
+                    try:
+                        os.link(template, path)
+                    except OSError:
+                        shutil.copyfile(template, path)
+                paths.append(path)
+    return paths
@@ -0,0 +1,317 @@
+"""Offline-Lastmessung der App gegen lokale Fakes.
+
+    python -m bench.run --output bench-results.json
+
+Startet die FastAPI-App in einem eigenen Prozess (Arbeitsverzeichnis in einem
+Temp-Ordner, PyiCloudService durch bench.fakes ersetzt, OpenAI über
+OPENAI_BASE_URL auf einen lokalen TTS-Ersatz umgeleitet) auf einem
+synthetischen Aufnahme-Baum. Gemessen werden p50/p99/Durchsatz je Endpunkt,
+Frames pro Sekunde und Server-CPU für N /system_stats-Sockets. Das Ergebnis
+ist JSON, damit es zwischen Releases verglichen werden kann.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import multiprocessing
+
+import httpx
+import psutil
+import websockets
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ICLOUD_CREDS = {"email": "bench@example.invalid", "password": "bench"}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_app(port, workdir, env):
+    """Zielfunktion des App-Prozesses: Fakes einsetzen, dann main:app mit uvicorn starten."""
+    os.environ.update(env)
+    # Ausgaben der App gehören nicht in den JSON-Bericht auf stdout
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.path.insert(0, REPO_ROOT)
+    os.chdir(workdir)
+
+    import modules.icloud
+    from bench.fakes import FakePyiCloudService
+
+    modules.icloud.PyiCloudService = FakePyiCloudService
+
+    import uvicorn
+    import main
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ---- Auswertung -----------------------------------------------------------
+
+def _percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    ms = [l * 1000 for l in latencies]
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "p50_ms": round(_percentile(ms, 50), 2) if ms else None,
+        "p99_ms": round(_percentile(ms, 99), 2) if ms else None,
+        "mean_ms": round(statistics.fmean(ms), 2) if ms else None,
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+async def run_http(client, make_request, requests, concurrency):
+    """`requests` Anfragen mit `concurrency` parallelen Workern; make_request(i) -> (method, url, kwargs)."""
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = make_request(i)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                await response.aread()
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def _cpu_seconds(process):
+    total = 0.0
+    for p in [process] + process.children(recursive=True):
+        try:
+            times = p.cpu_times()
+            total += times.user + times.system
+        except psutil.NoSuchProcess:
+            pass
+    return total
+
+
+async def run_system_stats(base_ws, server, sockets, duration):
+    """N gleichzeitige /system_stats-Sockets: Frames pro Sekunde und Server-CPU."""
+    frames = 0
+
+    async def reader(ws):
+        nonlocal frames
+        async for _ in ws:
+            frames += 1
+
+    connections = [await websockets.connect(f"{base_ws}/system_stats", max_size=None) for _ in range(sockets)]
+    readers = [asyncio.create_task(reader(ws)) for ws in connections]
+    await asyncio.sleep(1)  # Verbindungsaufbau und ersten Frame aus der Messung heraushalten
+    frames = 0
+    cpu_before, started = _cpu_seconds(server), time.perf_counter()
+    await asyncio.sleep(duration)
+    elapsed = time.perf_counter() - started
+    cpu = _cpu_seconds(server) - cpu_before
+    for task in readers:
+        task.cancel()
+    for ws in connections:
+        await ws.close()
+    return {
+        "sockets": sockets,
+        "frames_per_second": round(frames / elapsed, 1),
+        "frames_per_second_per_socket": round(frames / elapsed / max(1, sockets), 2),
+        "server_cpu_percent": round(cpu / elapsed * 100, 1),
+    }
+
+
+async def run_tts(base_ws, requests, concurrency):
+    """TTS über den WebSocket: Zeit bis zum ersten Audio-Chunk und bis Segmentende."""
+    first_chunk, totals, errors = [], [], 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        async with websockets.connect(f"{base_ws}/openai/whisper/tts", max_size=None) as ws:
+            await ws.send(json.dumps({"type": "config", "format": "mp3", "pipeline": True}))
+            await ws.recv()
+            for i in counter:
+                # eindeutiger Text, damit der TTS-Cache nicht greift
+                await ws.send(f"Dies ist Testsatz Nummer {i} für die Lastmessung der Sprachausgabe.")
+                started = time.perf_counter()
+                got_audio = False
+                while True:
+                    message = await ws.recv()
+                    if isinstance(message, bytes):
+                        if not got_audio:
+                            first_chunk.append(time.perf_counter() - started)
+                            got_audio = True
+                    elif message.startswith("Fehler"):
+                        errors += 1
+                    elif json.loads(message).get("type") == "segment_end":
+                        break
+                totals.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = summarize(totals, errors, time.perf_counter() - started)
+    result["first_chunk_p50_ms"] = round(_percentile(first_chunk, 50) * 1000, 2) if first_chunk else None
+    result["first_chunk_p99_ms"] = round(_percentile(first_chunk, 99) * 1000, 2) if first_chunk else None
+    return result
+
+
+# ---- Ablauf ---------------------------------------------------------------
+
+async def benchmark(args, base_url, server, clips):
+    base_ws = base_url.replace("http://", "ws://")
+    results = {}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        # Index/Katalog aufbauen lassen, erste Anfrage nicht mitmessen
+        await client.get("/records")
+        rng = random.Random(1)
+        clip_size = os.path.getsize(clips[0])
+        n, c = args.requests, args.concurrency
+
+        def ranged_read(i):
+            start = rng.randrange(0, max(1, clip_size - 1))
+            end = min(clip_size - 1, start + args.range_bytes - 1)
+            return "GET", "/video", {"params": {"url": rng.choice(clips)}, "headers": {"Range": f"bytes={start}-{end}"}}
+
+        scenarios = {
+            "records_tree": lambda i: ("GET", "/records", {}),
+            "records_page": lambda i: ("GET", "/records", {"params": {"camera": "cam00", "limit": 500}}),
+            "video_range": ranged_read,
+            "thumbnail_cold": lambda i: ("GET", "/thumbnail", {"params": {"url": clips[i % len(clips)]}}),
+            "thumbnail_warm": lambda i: ("GET", "/thumbnail", {"params": {"url": clips[i % min(len(clips), 50)]}}),
+            "icloud_events": lambda i: ("POST", "/icloud/events", {"json": {"creds": ICLOUD_CREDS}}),
+            "icloud_devices": lambda i: ("POST", "/icloud/devices", {"json": ICLOUD_CREDS}),
+            "icloud_devices_fresh": lambda i: ("POST", "/icloud/devices", {"params": {"fresh": "true"}, "json": ICLOUD_CREDS}),
+        }
+        for name, make_request in scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            requests = min(n, args.icloud_requests) if name.startswith("icloud") else n
+            results[name] = await run_http(client, make_request, requests, c)
+            print(f"{name}: {results[name]}", file=sys.stderr)
+
+    if not args.only or "tts" in args.only:
+        results["tts"] = await run_tts(base_ws, args.tts_requests, min(c, args.tts_requests))
+        print(f"tts: {results['tts']}", file=sys.stderr)
+
+    if not args.only or "system_stats" in args.only:
+        results["system_stats"] = [
+            await run_system_stats(base_ws, server, sockets, args.duration) for sockets in (0, *args.sockets)
+        ]
+        print(f"system_stats: {results['system_stats']}", file=sys.stderr)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="JSON-Datei (Standard: stdout)")
+    parser.add_argument("--workdir", help="Arbeitsverzeichnis für Baum, Datenbank und Caches (Standard: temporär)")
+    parser.add_argument("--cameras", type=int, default=4)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--clips-per-day", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--icloud-requests", type=int, default=100)
+    parser.add_argument("--tts-requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--range-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--sockets", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--duration", type=float, default=10, help="Sekunden pro /system_stats-Messung")
+    parser.add_argument("--only", nargs="+", help="nur diese Szenarien")
+    args = parser.parse_args()
+
+    from bench.fakes import make_cctv_tree, start_tts_server
+
+    with tempfile.TemporaryDirectory(prefix="nexatalk-bench-") as tmp:
+        workdir = args.workdir or tmp
+        os.makedirs(workdir, exist_ok=True)
+        cctv = os.path.join(workdir, "cctv")
+        clips = make_cctv_tree(cctv, args.cameras, args.days, args.clips_per_day)
+
+        tts_port, app_port = _free_port(), _free_port()
+        tts_server = start_tts_server(tts_port)
+        env = {
+            "RECORDINGS_BASE_PATH": cctv,
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{tts_port}/v1",
+            "OPEN_AI_API_KEY": "bench",
+            "TTS_PERSIST_AUDIO": "false",
+            "CLIP_FASTSTART": "false",
+            "STATS_HISTORY_PATH": "",
+        }
+        context = multiprocessing.get_context("spawn")
+        # nicht daemonisch: die App startet eigene Prozess-Pools (Thumbnails, Metadaten)
+        process = context.Process(target=serve_app, args=(app_port, workdir, env))
+        process.start()
+        base_url = f"http://127.0.0.1:{app_port}"
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    httpx.get(f"{base_url}/", timeout=1)
+                    break
+                except httpx.HTTPError:
+                    if time.monotonic() > deadline or not process.is_alive():
+                        raise RuntimeError("App-Prozess ist nicht gestartet")
+                    time.sleep(0.2)
+
+            results = asyncio.run(benchmark(args, base_url, psutil.Process(process.pid), clips))
+        finally:
+            process.terminate()
+            process.join(10)
+            tts_server.should_exit = True
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "clips": len(clips),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "workdir")},
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,54 @@
+from modules import startup
+startup.track_imports()  # nur mit DEBUG: Importzeiten für den Startbericht
+
 import asyncio
-import threading
+import time
 import os
+import stat
 import json
 import urllib
 
 from typing import Optional
-from dotenv import load_dotenv
 from pydantic import BaseModel
 from fastapi import HTTPException, FastAPI, WebSocket, Request, Query
-from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, FileResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import Depends
 from fastapi import WebSocketDisconnect
+from starlette.background import BackgroundTask
 
-from datetime import datetime
-
-from aiortc import RTCPeerConnection, RTCSessionDescription
-from aiortc.contrib.media import MediaRelay
+from datetime import datetime, timedelta
 
 from modules.system_stats import get_system_data
-from modules.open_ai import OpenAiAssistant
-from modules.icloud import iCloudService
-from modules.recordings import find_all_videos, get_thumbnail_path
-
-pcs = set()
-relay = MediaRelay()
-
-app = FastAPI()
+from modules.broadcast import SnapshotBroadcaster
+from modules.stats_history import StatsHistory
+from modules.processes import ProcessSampler, PROCESS_SAMPLE_INTERVAL
+from modules.open_ai import OpenAiAssistant, TTSOptions
+from modules.icloud import iCloudSessionPool, credentials_key
+from modules.calendar_cache import CalendarIntervalCache, to_date
+from modules.devices import DeviceRefresher
+from modules.offload import BoundedExecutor
+from modules.recordings import RecordingsIndex, RECORDINGS_READY_TIMEOUT
+from modules.thumbnails import ThumbnailService
+from modules.catalog import RecordingsCatalog, DEFAULT_PAGE_SIZE
+from modules.video_stream import build_file_response
+from modules.media_probe import ClipMaintenance
+from modules.timeline import TimelineStreamer, TIMELINE_MAX_SPAN
+from modules.metrics import REGISTRY, Gauge, MetricsMiddleware, SamplingProfiler, METRICS_PROFILER
+from modules.serialization import FastJSONResponse, check_encoding, encode, send_frame
+from modules.workers import WorkerCluster
+from modules.outbound import OutboundQueue
+
+startup.mark("imports")
+
+def create_camera_hub():
+    # aiortc/av erst laden, wenn jemand eine Kamera sehen will
+    from aiortc.contrib.media import MediaRelay
+    from modules.cams import CameraHub
+
+    return CameraHub(MediaRelay(), set())
+
+app = FastAPI(default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,16 +57,186 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-openai_assistant = OpenAiAssistant()
-icloud_client = iCloudService()
+app.add_middleware(MetricsMiddleware)
+
+# Schwere Subsysteme (openai, aiortc) entstehen erst beim ersten Aufruf ihrer Routen
+openai_assistant = startup.LazyService("openai", OpenAiAssistant)
+camera_hub = startup.LazyService("cams", create_camera_hub)
+icloud_pool = iCloudSessionPool()
+calendar_cache = CalendarIntervalCache()
+
+# Eigene, begrenzte Thread-Pools pro Subsystem für blockierende Aufrufe
+icloud_offload = BoundedExecutor.from_env("icloud", max_workers=8, max_queue=32, timeout=30)
+filesystem_offload = BoundedExecutor.from_env("filesystem", max_workers=8, max_queue=64, timeout=10)
+
+device_refresher = DeviceRefresher(icloud_pool, offload=icloud_offload)
+system_stats_broadcaster = SnapshotBroadcaster(get_system_data, tick=1.0, name="system-stats")
+stats_history = StatsHistory()
+system_stats_broadcaster.add_listener(stats_history.on_sample)
+# Eigener Kanal: der Prozess-Sampler läuft nur, solange jemand /system_stats/processes abonniert
+process_broadcaster = SnapshotBroadcaster(ProcessSampler().collect, tick=PROCESS_SAMPLE_INTERVAL, name="processes")
+recordings_index = RecordingsIndex()
+recordings_catalog = RecordingsCatalog()
+recordings_index.add_listener(recordings_catalog.on_index_event)
+thumbnail_service = ThumbnailService(offload=filesystem_offload)
+recordings_index.add_listener(thumbnail_service.on_index_event)
+clip_maintenance = ClipMaintenance(recordings_catalog)
+
+# Zustand der Pools und Sampler wird erst beim Abruf von /metrics gelesen
+REGISTRY.register(Gauge(
+    "offload_pending", "Wartende und laufende Aufrufe je Thread-Pool", ("pool", "state"),
+    collect=lambda: [
+        ((pool.name, state), pool.stats()[state])
+        for pool in (icloud_offload, filesystem_offload) for state in ("active", "queued")
+    ],
+))
+REGISTRY.register(Gauge(
+    "broadcast_subscribers", "Abonnenten je Sampler", ("sampler",),
+    collect=lambda: [((b.name,), b.subscriber_count) for b in (system_stats_broadcaster, process_broadcaster)],
+))
+profiler = SamplingProfiler()
+timeline_streamer = TimelineStreamer()
 
 STATIC_AUDIO_DIR = "static/audio"
 os.makedirs(STATIC_AUDIO_DIR, exist_ok=True)
 
+startup.mark("dienste")
+
 @app.on_event("startup")
 async def on_startup():
     print("Starting up...")
+    # Mit WEB_CONCURRENCY > 1 übernimmt nur ein Worker die Hintergrundarbeit (lead)
+    await cluster.start()
+    startup.mark("startup")
+    startup.report()
+
+async def lead():
+    """Alles, was es über alle Worker hinweg nur einmal geben darf."""
+    system_stats_broadcaster.follow(None)
+    process_broadcaster.follow(None)
+    try:
+        await asyncio.to_thread(stats_history.load)
+    except (OSError, ValueError, EOFError) as e:
+        print(f"Statistik-Historie nicht geladen: {e}")
+    stats_history.start()
+    # Sampler läuft dauerhaft, damit die Historie auch ohne offene Dashboards wächst
+    system_stats_broadcaster.start()
+    thumbnail_service.start()
+    clip_maintenance.start()
+    # Index im Hintergrund aufbauen, damit der Start nicht blockiert
+    recordings_started = asyncio.get_running_loop().run_in_executor(None, start_recordings)
+    recordings_started.add_done_callback(report_recordings_start)
+
+def follow(client):
+    """Follower: Systemdaten kommen vom Leader, Aufnahmen direkt aus dem SQLite-Katalog."""
+    system_stats_broadcaster.follow(lambda: cluster.stream("stats.system"))
+    process_broadcaster.follow(lambda: cluster.stream("stats.processes"))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    system_stats_broadcaster.stop()
+    process_broadcaster.stop()
+    await stats_history.stop()
+    recordings_index.stop()
+    recordings_catalog.stop()
+    await thumbnail_service.stop()
+    timeline_streamer.stop()
+    await clip_maintenance.stop()
+    profiler.stop()
+    device_refresher.stop()
+    if camera_hub.instance is not None:
+        await camera_hub.instance.shutdown()
+    icloud_offload.shutdown()
+    filesystem_offload.shutdown()
+    await cluster.stop()
+
+def start_recordings():
+    """Katalog starten und den Index aus ihm vorbefüllen (kein Kaltstart-Scan nötig)."""
+    recordings_catalog.start()
+    recordings_index.start(seed=recordings_catalog.all_paths())
+
+def report_recordings_start(future):
+    # Ohne diese Meldung bliebe ein Fehler unsichtbar und /records antwortete nur noch mit 503
+    if not future.cancelled() and future.exception() is not None:
+        print(f"Fehler beim Start von Aufnahme-Katalog/-Index: {future.exception()!r}")
+
+# ---- Leader-Operationen ---------------------------------------------------
+# Laufen im Leader; Follower erreichen sie über cluster.run/cluster.stream
+
+async def op_stats_history(metrics, start, end, step):
+    try:
+        return await asyncio.to_thread(stats_history.query, metrics, start, end, step)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def op_icloud_events(email, password, start, end):
+    range = EventRange(start=start, end=end)
+    # Authentifizierte Session aus dem Pool (Login nur beim ersten Mal)
+    return await icloud_offload.run(
+        icloud_pool.call, email, password,
+        lambda service: service.get_calendar_events_in_range(range, cache=calendar_cache),
+        operation="calendar",
+    )
+
+async def op_icloud_invalidate(email, password, start, end):
+    try:
+        start = to_date(start) if start else None
+        end = to_date(end) if end else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    calendar_cache.invalidate(credentials_key(email, password), start, end)
+
+async def op_icloud_devices(email, password, fresh=False):
+    snapshot = await device_refresher.get(email, password, fresh=fresh)
+    return snapshot.to_dict()
+
+async def op_icloud_ring(email, password, device_id):
+    return await icloud_offload.run(
+        icloud_pool.call, email, password,
+        lambda service: service.ring_device(device_id),
+        operation="ring",
+        retry=False,  # zweiter Versuch würde das Gerät womöglich doppelt klingeln lassen
+    )
+
+async def op_clip_activity():
+    clip_maintenance.note_activity()
+
+async def watch_devices(email, password):
+    """Geräte-Snapshots bei jeder Änderung, beginnend mit dem aktuellen."""
+    queue = device_refresher.subscribe(email, password)
+    try:
+        if queue.empty():
+            await device_refresher.get(email, password)
+        while True:
+            snapshot = await queue.get()
+            yield snapshot.to_dict()
+    finally:
+        device_refresher.unsubscribe(email, password, queue)
+
+def note_clip_activity():
+    """Wiedergabe an ClipMaintenance im Leader melden, damit Remuxe pausieren."""
+    if cluster.is_leader:
+        clip_maintenance.note_activity()
+    else:
+        cluster.notify("clips.activity")
+
+cluster = WorkerCluster(
+    calls={
+        "stats.history": op_stats_history,
+        "icloud.events": op_icloud_events,
+        "icloud.invalidate": op_icloud_invalidate,
+        "icloud.devices": op_icloud_devices,
+        "icloud.ring": op_icloud_ring,
+        "clips.activity": op_clip_activity,
+    },
+    streams={
+        "stats.system": system_stats_broadcaster.samples,
+        "stats.processes": process_broadcaster.samples,
+        "icloud.devices.watch": watch_devices,
+    },
+    on_leader=lead,
+    on_follower=follow,
+)
 
 @app.get("/")
 async def get():
@@ -52,14 +244,23 @@ async def get():
     return HTMLResponse(html)
 
 @app.websocket("/system_stats")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, interval: int = 1, delta: bool = False, encoding: str = "json"):
+    """Live-Systemdaten; ?interval=1|5|30 wählt die Rate (Sekunden),
+    ?delta=true sendet nach dem ersten Frame nur noch Änderungen (JSON Merge Patch),
+    ?encoding=msgpack liefert Binär-Frames statt JSON-Text."""
     await websocket.accept()
-    
+
+    try:
+        subscription = system_stats_broadcaster.subscribe(interval, delta=delta, encoding=encoding)
+    except ValueError as e:
+        await websocket.send_text(f"Fehler: {str(e)}")
+        await websocket.close(code=1008)
+        return
+
     try:
         while True:
-            system_data = get_system_data()
-            await websocket.send_text(json.dumps(system_data))
-            await asyncio.sleep(1)
+            frame = await subscription.get()
+            await send_frame(websocket, frame)
 
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -68,36 +269,155 @@ async def websocket_endpoint(websocket: WebSocket):
         print(f"Fehler beim Verarbeiten der WebSocket-Verbindung: {e}")
         await websocket.send_text(f"Fehler: {str(e)}")
 
+    finally:
+        system_stats_broadcaster.unsubscribe(subscription)
+
+@app.websocket("/system_stats/processes")
+async def websocket_processes(websocket: WebSocket, interval: int = 5, delta: bool = False, encoding: str = "json"):
+    """Top-N-Prozesse nach CPU/RSS und Summen pro Benutzer; Parameter wie /system_stats."""
+    await websocket.accept()
+
+    try:
+        subscription = process_broadcaster.subscribe(interval, delta=delta, encoding=encoding)
+    except ValueError as e:
+        await websocket.send_text(f"Fehler: {str(e)}")
+        await websocket.close(code=1008)
+        return
+
+    try:
+        while True:
+            frame = await subscription.get()
+            await send_frame(websocket, frame)
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
+
+    except Exception as e:
+        print(f"Fehler beim Verarbeiten der WebSocket-Verbindung: {e}")
+        await websocket.send_text(f"Fehler: {str(e)}")
+
+    finally:
+        process_broadcaster.unsubscribe(subscription)
+
+@app.get("/system_stats/history")
+async def get_system_stats_history(
+    metrics: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    window: Optional[float] = Query(None, gt=0),
+    step: Optional[float] = Query(None, gt=0),
+):
+    """Verlauf als Spalten: {"start": t0, "step": s, "metrics": {name: [...]}}.
+    metrics: kommagetrennte Namen oder Präfixe (z.B. cpu.core,memory.percent);
+    Zeitraum über start/end (ISO) oder window (Sekunden bis jetzt, Standard 1h)."""
+    end_ts = parse_time_param(end, end=True)
+    start_ts = parse_time_param(start)
+    if start_ts is None and window is not None:
+        start_ts = (end_ts or datetime.now().timestamp()) - window
+    names = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else None
+    history = await cluster.run("stats.history", metrics=names, start=start_ts, end=end_ts, step=step)
+    return FastJSONResponse(content=history, status_code=200)
+
 @app.websocket("/openai/whisper/tts")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
+    # Alles läuft über eine begrenzte Sende-Queue: ein langsamer Client hält den OpenAI-Stream
+    # höchstens WS_AUDIO_BLOCK_TIMEOUT auf und wird dann getrennt
+    outbound = OutboundQueue(websocket, "tts").start()
+    # Standard: wav wie bisher; der Client kann per {"type": "config", "format": "opus", ...} umschalten
+    options = TTSOptions()
     
     try:
         while True:
             # Empfang von Text-Nachricht über den WebSocket
             text = await websocket.receive_text()
 
-            await openai_assistant.get_whisper_response(text, websocket)
+            try:
+                control = TTSOptions.from_message(text)
+            except ValueError as e:
+                await outbound.send_text(f"Fehler: {str(e)}")
+                continue
+            if control is not None:
+                options = control
+                await outbound.send_text(json.dumps(options.describe()))
+                continue
+
+            assistant = await openai_assistant.aget()
+            await assistant.get_whisper_response(text, outbound, options=options)
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
 
     except Exception as e:
         print(f"Fehler beim Verarbeiten der Anfrage: {e}")
-        await websocket.send_text(f"Fehler: {str(e)}")
+        try:
+            await outbound.send_text(f"Fehler: {str(e)}")
+        except WebSocketDisconnect:
+            pass
+
+    finally:
+        await outbound.close()
+
+@app.get("/openai/tts/cache")
+async def get_tts_cache_stats():
+    """Treffer/Fehlschläge und Belegung des TTS-Audio-Caches"""
+    return (await openai_assistant.aget()).cache.stats()
 
 @app.websocket("/cams")
 async def websocket_endpoint(websocket: WebSocket):
+    """WebRTC-Signalisierung:
+    {"type": "list"} -> {"type": "cameras", ...}
+    {"type": "offer", "camera": ..., "sdp": ..., "sdpType": "offer"} -> {"type": "answer", ...}
+    {"type": "close", "camera": ...} beendet die Verbindung zu einer Kamera."""
     await websocket.accept()
+    try:
+        hub = await camera_hub.aget()
+    except Exception as e:
+        await websocket.send_text(f"Fehler: {str(e)}")
+        await websocket.close(code=1011)
+        return
+    peers = {}
     
     try:
         while True:
             # Empfang von Text-Nachricht über den WebSocket
             text = await websocket.receive_text()
 
-            print(text)
+            try:
+                message = json.loads(text)
+                kind = message.get("type")
+                if kind == "list":
+                    await websocket.send_text(json.dumps({"type": "cameras", "cameras": hub.cameras()}))
+                elif kind == "offer":
+                    camera = message["camera"]
+                    if camera in peers:
+                        await hub.close_peer(peers.pop(camera))
+                    pc, answer = await hub.handle_offer(camera, message["sdp"], message.get("sdpType", "offer"))
+                    peers[camera] = pc
+                    await websocket.send_text(json.dumps({
+                        "type": "answer", "camera": camera, "sdp": answer.sdp, "sdpType": answer.type,
+                    }))
+                elif kind == "close":
+                    pc = peers.pop(message.get("camera"), None)
+                    if pc is not None:
+                        await hub.close_peer(pc)
+                else:
+                    await websocket.send_text(f"Fehler: Unbekannte Nachricht: {kind}")
+            except (ValueError, KeyError, AttributeError) as e:
+                await websocket.send_text(f"Fehler: {str(e)}")
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
 
     except Exception as e:
         print(f"Fehler beim Verarbeiten der Anfrage: {e}")
         await websocket.send_text(f"Fehler: {str(e)}")
 
+    finally:
+        # Peer-Connections dieses Clients aufräumen (gibt auch die Kamera frei)
+        for pc in peers.values():
+            await hub.close_peer(pc)
+
 class iCloudAuth(BaseModel):
     email: str
     password: str
@@ -117,71 +437,226 @@ def get_default_timeframe(): #current month
 
 @app.post("/icloud/events")
 async def get_events_by_timeframe(creds: iCloudAuth, range: Optional[EventRange] = None):
-    """Dynamische Authentifizierung bei jedem Request"""
+    """Authentifizierung über den Session-Pool"""
     if range is None:
         range_values = get_default_timeframe()
         range = EventRange(**range_values)
 
     try:
-        # Neue Instanz von iCloudService mit den übergebenen Anmeldedaten
-        icloud_service = iCloudService(email=creds.email, password=creds.password)
-        icloud_service.authenticate()  # Authentifizierung durchführen
-        
-        events = icloud_service.get_calendar_events_in_range(range)
-        return events
+        return await cluster.run(
+            "icloud.events", email=creds.email, password=creds.password, start=range.start, end=range.end,
+        )
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class EventInvalidation(BaseModel):
+    start: Optional[str] = None
+    end: Optional[str] = None
+
+@app.post("/icloud/events/invalidate")
+async def invalidate_events(creds: iCloudAuth, range: Optional[EventInvalidation] = None):
+    """Kalender-Cache des Accounts verwerfen (ganz oder nur für einen Zeitraum)"""
+    await cluster.run(
+        "icloud.invalidate", email=creds.email, password=creds.password,
+        start=range.start if range else None, end=range.end if range else None,
+    )
+    return FastJSONResponse(content={"status": "success"}, status_code=200)
+
 @app.post("/icloud/devices")
-async def get_iphone_data(creds: iCloudAuth):
-    """Dynamische Authentifizierung bei jedem Request"""
+async def get_iphone_data(creds: iCloudAuth, fresh: bool = False):
+    """Letzter Geräte-Snapshot aus dem Hintergrund-Refresher; ?fresh=true lädt neu.
+    Das Alter des Snapshots steht im Age-Header (Sekunden)."""
     try:
-        # Neue Instanz von iCloudService mit den übergebenen Anmeldedaten
-        icloud_service = iCloudService(email=creds.email, password=creds.password)
-        icloud_service.authenticate()  # Authentifizierung durchführen
-
-        print(creds)
-        
-        data = icloud_service.get_devices()
+        snapshot = await cluster.run("icloud.devices", email=creds.email, password=creds.password, fresh=fresh)
         # return data
-        return JSONResponse(content=data, status_code=200)
+        return FastJSONResponse(
+            content=snapshot["devices"],
+            status_code=200,
+            headers={"Age": str(int(snapshot["age"]))},
+        )
+
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.websocket("/icloud/devices/ws")
+async def websocket_devices(websocket: WebSocket, encoding: str = "json"):
+    """Erste Nachricht: {"email": ..., "password": ...}; danach kommt bei jeder Änderung ein Snapshot
+    (?encoding=msgpack für Binär-Frames)."""
+    await websocket.accept()
+
+    try:
+        check_encoding(encoding)
+        creds = iCloudAuth(**json.loads(await websocket.receive_text()))
+    except Exception as e:
+        await websocket.send_text(f"Fehler: {str(e)}")
+        await websocket.close(code=1008)
+        return
+
+    snapshots = cluster.stream("icloud.devices.watch", email=creds.email, password=creds.password)
+    try:
+        async for snapshot in snapshots:
+            await send_frame(websocket, encode(snapshot, encoding))
+
+    except WebSocketDisconnect:
+        print("Client disconnected")
+
+    except Exception as e:
+        print(f"Fehler beim Verarbeiten der WebSocket-Verbindung: {e}")
+        await websocket.send_text(f"Fehler: {str(e)}")
+
+    finally:
+        await snapshots.aclose()
+
 class RingDevice(BaseModel):
     device_id: str
 
 @app.post("/icloud/devices/ring")
 async def ring_device(creds: iCloudAuth, ring_device: RingDevice):
-    """Dynamische Authentifizierung bei jedem Request"""
+    """Authentifizierung über den Session-Pool"""
     try:
-        icloud_service = iCloudService(email=creds.email, password=creds.password)
-        icloud_service.authenticate()
-
-        print(creds)
-        print(ring_device)
+        data = await cluster.run(
+            "icloud.ring", email=creds.email, password=creds.password, device_id=ring_device.device_id,
+        )
 
-        data = icloud_service.ring_device(ring_device.device_id)  
+        return FastJSONResponse(content={"status": "success", "data": data}, status_code=200)
 
-        return JSONResponse(content={"status": "success", "data": data}, status_code=200)
+    except HTTPException:
+        raise
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_time_param(value: Optional[str], end=False):
+    """ISO-Datum/-Zeit als Unix-Zeit; ein reines Datum als Ende schließt den ganzen Tag ein."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Ungültiges Datum: {value}")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(microseconds=1)
+    return parsed.timestamp()
+
+@app.get("/metrics")
+async def get_metrics():
+    """Alle Metriken im Prometheus-Textformat"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+def require_profiler():
+    if not METRICS_PROFILER:
+        raise HTTPException(status_code=404, detail="Profiler nicht aktiviert (METRICS_PROFILER=true)")
+
+@app.post("/debug/profiler/start", dependencies=[Depends(require_profiler)])
+async def start_profiler(interval: float = Query(0.01, ge=0.001, le=1.0)):
+    """Startet den Stichproben-Profiler (Intervall in Sekunden)"""
+    profiler.start(interval)
+    return profiler.status()
+
+@app.post("/debug/profiler/stop", dependencies=[Depends(require_profiler)])
+async def stop_profiler():
+    await asyncio.to_thread(profiler.stop)
+    return profiler.status()
+
+@app.get("/debug/profiler", dependencies=[Depends(require_profiler)])
+async def get_profile():
+    """Gesammelte Stacks im folded-Format (flamegraph.pl, speedscope)"""
+    return PlainTextResponse(profiler.folded())
+
+@app.get("/offload/stats")
+async def get_offload_stats():
+    """Auslastung der Thread-Pools (aktiv, wartend, abgelehnt, Timeouts)"""
+    return {pool.name: pool.stats() for pool in (icloud_offload, filesystem_offload)}
+
 @app.get("/records")
-async def get_records():
-    records = find_all_videos()
-    return JSONResponse(content=records, status_code=200)
+async def get_records(
+    camera: Optional[str] = None,
+    day: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    order: str = Query("asc", pattern="^(asc|desc)$"),
+):
+    """Ohne start/end/cursor/limit: kompletter Baum wie bisher.
+    Sonst seitenweise Liste aus dem SQLite-Katalog mit next_cursor, inkl. Metadaten
+    (duration, width, height, codec, bitrate, faststart), sobald die Aufnahme geprüft ist."""
+    if any(v is not None for v in (start, end, cursor, limit)):
+        try:
+            items, next_cursor = await filesystem_offload.run(
+                recordings_catalog.query,
+                camera=camera,
+                day=day,
+                start=parse_time_param(start),
+                end=parse_time_param(end, end=True),
+                cursor=cursor,
+                limit=limit or DEFAULT_PAGE_SIZE,
+                order=order,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return FastJSONResponse(content={"items": items, "next_cursor": next_cursor}, status_code=200)
+
+    if not cluster.is_leader:
+        # Nur der Leader führt den Index; die anderen Worker lesen den Katalog
+        records = await filesystem_offload.run(recordings_catalog.tree, camera=camera, day=day)
+        return FastJSONResponse(content=records, status_code=200)
+
+    # Beim allerersten Start ohne Katalog auf den initialen Scan warten (ohne Thread zu belegen)
+    deadline = time.monotonic() + RECORDINGS_READY_TIMEOUT
+    while not recordings_index.ready.is_set():
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=503, detail="Aufnahme-Index wird noch aufgebaut",
+                                headers={"Retry-After": "5"})
+        await asyncio.sleep(0.1)
+    records = recordings_index.snapshot(camera=camera, day=day)
+    return FastJSONResponse(content=records, status_code=200)
+
+@app.get("/timeline")
+async def get_timeline(
+    camera: str,
+    start: str,
+    end: str,
+):
+    """Aufnahmen einer Kamera im Zeitraum als ein durchgehendes MP4 (Stream-Copy, kein Transkodieren).
+    Ton wird mitgeliefert, sofern schon die erste Aufnahme eine Tonspur hat.
+    X-Timeline-Start ist die Wanduhrzeit der Videoposition 0."""
+    start_ts = parse_time_param(start)
+    end_ts = parse_time_param(end, end=True)
+    if end_ts <= start_ts:
+        raise HTTPException(status_code=400, detail="end muss nach start liegen")
+    if end_ts - start_ts > TIMELINE_MAX_SPAN:
+        raise HTTPException(status_code=400, detail=f"Zeitraum zu lang (max. {int(TIMELINE_MAX_SPAN)} s)")
+
+    note_clip_activity()
+    segments = await filesystem_offload.run(recordings_catalog.segments, camera, start_ts, end_ts)
+    stream = await timeline_streamer.open(segments, start_ts, end_ts) if segments else None
+    if stream is None:
+        raise HTTPException(status_code=404, detail="Keine Aufnahmen im Zeitraum")
+
+    # close() gibt den Remux-Slot auch frei, wenn der Body-Generator nie bis zum Ende läuft
+    return StreamingResponse(
+        stream.body(),
+        media_type="video/mp4",
+        headers={"X-Timeline-Start": f"{stream.origin:.3f}", "Cache-Control": "no-store"},
+        background=BackgroundTask(stream.close),
+    )
 
 @app.get("/thumbnail")
 async def get_thumbnail(video_url: str = Query(..., alias="url")):
     video_url_decoded = urllib.parse.unquote(video_url)
     
-    thumbnail_path = get_thumbnail_path(video_url_decoded)
-    
-    if not os.path.isfile(thumbnail_path):
+    # Vorhandenes _thumb.jpg, Cache oder on-demand im Prozess-Pool erzeugt
+    thumbnail_path = await thumbnail_service.get(video_url_decoded)
+
+    if thumbnail_path is None:
         raise HTTPException(status_code=404, detail="Thumbnail nicht gefunden")
 
     return FileResponse(
@@ -190,7 +665,7 @@ async def get_thumbnail(video_url: str = Query(..., alias="url")):
         filename=os.path.basename(thumbnail_path)
     )
 
-@app.get("/video")
+@app.api_route("/video", methods=["GET", "HEAD"])
 async def stream_video(request: Request, video_url: str = Query(..., alias="url")):
     # URL dekodieren, um sicherzustellen, dass sie korrekt verarbeitet wird
     video_url_decoded = urllib.parse.unquote(video_url)  
@@ -199,41 +674,18 @@ async def stream_video(request: Request, video_url: str = Query(..., alias="url"
     # if video_url_decoded.startswith("/"):
     #     return {"error": "Ungültiger Pfad: Absoluter Pfad ist nicht erlaubt"}
 
+    note_clip_activity()
+
     # Überprüfen, ob die Datei existiert
-    if not os.path.isfile(video_url_decoded):
+    try:
+        st = await filesystem_offload.run(os.stat, video_url_decoded)
+    except OSError:
+        return {"error": "Datei nicht gefunden"}
+    if not stat.S_ISREG(st.st_mode):
         return {"error": "Datei nicht gefunden"}
 
-    file_size = os.path.getsize(video_url_decoded)
-    range_header = request.headers.get("range")
-
-    if range_header:
-        # Byte-Range parsen
-        range_value = range_header.strip().lower().replace("bytes=", "")
-        range_start, range_end = range_value.split("-")
-        range_start = int(range_start)
-        range_end = int(range_end) if range_end else file_size - 1
-        length = range_end - range_start + 1
-
-        def file_stream():
-            with open(video_url_decoded, "rb") as f:
-                f.seek(range_start)
-                yield f.read(length)
-
-        return StreamingResponse(
-            file_stream(),
-            status_code=206,
-            headers={
-                "Content-Range": f"bytes {range_start}-{range_end}/{file_size}",
-                "Accept-Ranges": "bytes",
-                "Content-Length": str(length),
-                "Content-Type": "video/mp4",
-            },
-        )
-    else:
-        return StreamingResponse(
-            open(video_url_decoded, "rb"),
-            media_type="video/mp4"
-        )
+    # Range/Multi-Range, HEAD, ETag/Last-Modified/If-Range
+    return build_file_response(request.headers, request.method, video_url_decoded, st, media_type="video/mp4")
 
 
 # class CalendarRequest(BaseModel):
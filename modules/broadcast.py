@@ -0,0 +1,264 @@
+import asyncio
+
+from modules.metrics import WEBSOCKET_FRAMES_DROPPED
+from modules.outbound import track_queue, untrack_queue
+from modules.serialization import encode, check_encoding
+
+ALLOWED_INTERVALS = (1, 5, 30)  # Sekunden
+
+
+def merge_patch(old, new):
+    """JSON Merge Patch (RFC 7396) von `old` nach `new`; entfernte Schlüssel werden zu None."""
+    patch = {}
+    for key, value in new.items():
+        if key not in old:
+            patch[key] = value
+            continue
+        previous = old[key]
+        if isinstance(value, dict) and isinstance(previous, dict):
+            sub_patch = merge_patch(previous, value)
+            if sub_patch:
+                patch[key] = sub_patch
+        elif value != previous:
+            patch[key] = value
+    for key in old:
+        if key not in new:
+            patch[key] = None
+    return patch
+
+
+class _Tick:
+    """Ein Sample mit seinen Frames; jede Kodierung wird pro Tick höchstens einmal erzeugt."""
+
+    __slots__ = ("sample", "_frames")
+
+    def __init__(self, sample, frame):
+        self.sample = sample
+        self._frames = {"json": frame}
+
+    def frame(self, encoding):
+        frame = self._frames.get(encoding)
+        if frame is None:
+            frame = self._frames[encoding] = encode(self.sample, encoding)
+        return frame
+
+
+class Subscription:
+    """Ein Abonnent eines SnapshotBroadcaster; hält immer nur den neuesten Sample.
+
+    Im Delta-Modus kommt zuerst {"type": "full", "data": ...}, danach nur noch
+    {"type": "patch", "data": ...} als Merge Patch gegenüber dem zuletzt
+    tatsächlich ausgelieferten Sample – verworfene Frames brechen die Kette
+    also nicht. Mit encoding="msgpack" sind die Frames bytes statt str.
+
+    Die Queue ist die Sende-Queue der Verbindung (Policy "neuester gewinnt"):
+    ein langsamer Client verliert Zwischenstände, bremst aber weder den
+    Sampler noch andere Abonnenten. Verworfene Frames zählt `dropped`.
+    """
+
+    def __init__(self, broadcaster, every, offset, delta=False, encoding="json"):
+        self.broadcaster = broadcaster
+        self.every = every
+        self.offset = offset
+        self.delta = delta
+        self.encoding = encoding
+        self.last_sample = None
+        self.dropped = 0
+        self.queue = asyncio.Queue(maxsize=1)
+
+    @property
+    def stream(self):
+        return self.broadcaster.name
+
+    @property
+    def depth(self):
+        return self.queue.qsize()
+
+    def push(self, tick):
+        # Veraltete Frames verwerfen, nur der aktuellste zählt
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            WEBSOCKET_FRAMES_DROPPED.inc(self.broadcaster.name)
+        self.queue.put_nowait(tick)
+
+    async def get(self):
+        tick = await self.queue.get()
+        if not self.delta:
+            return tick.frame(self.encoding)
+        previous, self.last_sample = self.last_sample, tick.sample
+        if previous is None:
+            if self.encoding == "json":
+                return f'{{"type": "full", "data": {tick.frame("json")}}}'
+            return encode({"type": "full", "data": tick.sample}, self.encoding)
+        return self.broadcaster.patch_frame(previous, tick.sample, self.encoding)
+
+
+class SnapshotBroadcaster:
+    """Ein einziger Sampler-Task pro Datenquelle, der an alle Abonnenten verteilt.
+
+    `collect` wird pro Tick genau einmal in einem Worker-Thread aufgerufen, das
+    Ergebnis einmal serialisiert und derselbe String an alle fälligen
+    Abonnenten verteilt. Langsamere Raten (z.B. 5s, 30s) bekommen jeden n-ten
+    Sample; das Intervall muss daher ein Vielfaches von `tick` sein. Ticks,
+    an denen weder ein Listener noch ein Abonnent fällig ist, werden ohne
+    collect() übersprungen. Der Task läuft nur, solange es Abonnenten oder
+    Listener gibt.
+
+    Mit follow(source) kommen die Samples statt aus `collect` aus einem
+    asynchronen Iterator (z.B. vom Leader-Worker); Listener laufen dann nicht,
+    die gehören zum Prozess, der selbst sammelt.
+    """
+
+    def __init__(self, collect, tick=1.0, name="broadcaster"):
+        self.collect = collect
+        self.tick = tick
+        self.name = name
+        self._subscribers = set()
+        self._listeners = []
+        self._task = None
+        self._source = None
+        self._tick_count = 0
+        self._last = None
+        self._patch_cache = {}
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def subscribe(self, interval=1, delta=False, encoding="json"):
+        if interval not in ALLOWED_INTERVALS:
+            raise ValueError(f"Intervall muss einer von {ALLOWED_INTERVALS} sein")
+        every = round(interval / self.tick)
+        if every < 1 or abs(every * self.tick - interval) > 1e-6:
+            raise ValueError(f"Intervall {interval} s ist kein Vielfaches des Sampling-Takts ({self.tick:g} s)")
+        check_encoding(encoding)
+        return self._add(Subscription(self, every=every, offset=self._tick_count, delta=delta, encoding=encoding))
+
+    def _add(self, sub):
+        self._subscribers.add(sub)
+        track_queue(sub)
+        if self._last is not None:
+            # Neuer Client bekommt sofort den letzten Stand
+            sub.push(self._last)
+        self._ensure_running()
+        return sub
+
+    def add_listener(self, callback):
+        """callback(sample) bei jedem Tick im Event-Loop; hält den Sampler dauerhaft am Laufen."""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Startet den Sampler für die Listener, auch ohne Abonnenten."""
+        if self._listeners and self._source is None:
+            self._ensure_running()
+
+    def follow(self, source):
+        """Samples aus `source()` beziehen statt selbst zu sammeln; None schaltet zurück."""
+        self._source = source
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._subscribers or (self._listeners and source is None):
+            self._ensure_running()
+
+    async def samples(self):
+        """Asynchroner Iterator über jeden rohen Sample, z.B. zur Weitergabe an andere Worker."""
+        sub = self._add(Subscription(self, every=1, offset=self._tick_count))
+        try:
+            while True:
+                tick = await sub.queue.get()
+                yield tick.sample
+        finally:
+            self.unsubscribe(sub)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self.name)
+
+    def unsubscribe(self, sub):
+        self._subscribers.discard(sub)
+        untrack_queue(sub)
+
+    def patch_frame(self, previous, sample, encoding="json"):
+        """Serialisierter Patch; Abonnenten mit gleichem Vorgänger teilen sich das Ergebnis."""
+        key = (id(previous), id(sample), encoding)
+        cached = self._patch_cache.get(key)
+        if cached is not None and cached[0] is previous and cached[1] is sample:
+            return cached[2]
+        frame = encode({"type": "patch", "data": merge_patch(previous, sample)}, encoding)
+        if len(self._patch_cache) >= 64:
+            self._patch_cache.clear()
+        self._patch_cache[key] = (previous, sample, frame)
+        return frame
+
+    def _publish(self, sample, listeners=True):
+        try:
+            frame = encode(sample)
+        except Exception as e:
+            print(f"Fehler beim Serialisieren ({self.name}): {e}")
+            return
+        if listeners:
+            for callback in self._listeners:
+                try:
+                    callback(sample)
+                except Exception as e:
+                    print(f"Fehler im Listener ({self.name}): {e}")
+        self._last = _Tick(sample, frame)
+        for sub in list(self._subscribers):
+            if (self._tick_count - sub.offset) % sub.every == 0:
+                sub.push(self._last)
+
+    def _due(self):
+        if self._listeners:
+            return True
+        return any((self._tick_count - sub.offset) % sub.every == 0 for sub in self._subscribers)
+
+    async def _run(self):
+        try:
+            if self._source is not None:
+                await self._follow_source()
+            else:
+                await self._sample()
+        finally:
+            if self._task is None or self._task is asyncio.current_task():
+                self._last = None
+                self._patch_cache.clear()
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        while self._subscribers or self._listeners:
+            if self._due():
+                try:
+                    sample = await asyncio.to_thread(self.collect)
+                except Exception as e:
+                    print(f"Fehler beim Sammeln ({self.name}): {e}")
+                else:
+                    self._publish(sample)
+            self._tick_count += 1
+
+            # bei zu langsamem Sammeln nicht nachholen, sondern neu takten
+            next_tick = max(next_tick + self.tick, loop.time())
+            await asyncio.sleep(next_tick - loop.time())
+
+    async def _follow_source(self):
+        while self._subscribers:
+            try:
+                stream = self._source()
+                try:
+                    async for sample in stream:
+                        self._publish(sample, listeners=False)
+                        self._tick_count += 1
+                        if not self._subscribers:
+                            break
+                finally:
+                    await stream.aclose()
+            except Exception as e:
+                print(f"Fehler beim Empfangen ({self.name}): {e}")
+            if self._subscribers:
+                await asyncio.sleep(self.tick)
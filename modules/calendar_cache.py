@@ -0,0 +1,168 @@
+import os
+import time
+import threading
+from datetime import date, datetime, timedelta
+
+CALENDAR_CACHE_TTL = float(os.getenv("CALENDAR_CACHE_TTL", "300"))  # Sekunden
+
+ONE_DAY = timedelta(days=1)
+
+
+def _event_day(value):
+    """iCloud-Datumsliste [yyyymmdd, Jahr, Monat, Tag, ...] -> date."""
+    try:
+        return date(value[1], value[2], value[3])
+    except (TypeError, IndexError, ValueError):
+        return None
+
+
+def _event_key(event):
+    # Wiederholungen teilen sich die guid, unterscheiden sich aber im Startdatum
+    return event.get("guid"), tuple(event.get("startDate") or ())
+
+
+def _event_overlaps(event, start, end):
+    event_start = _event_day(event.get("startDate"))
+    event_end = _event_day(event.get("endDate")) or event_start
+    if event_start is None:
+        # ohne Datum lieber mitliefern als verlieren
+        return True
+    return event_start <= end and event_end >= start
+
+
+class _AccountCalendar:
+    def __init__(self):
+        self.intervals = []  # sortiert, [start, end, fetched_at], Tage inklusive
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def drop_stale(self, now, ttl):
+        fresh = [i for i in self.intervals if now - i[2] <= ttl]
+        if len(fresh) != len(self.intervals):
+            self.intervals = fresh
+            self.events = {
+                key: event for key, event in self.events.items()
+                if any(_event_overlaps(event, s, e) for s, e, _ in fresh)
+            }
+
+    def gaps(self, start, end):
+        """Nicht abgedeckte Teilbereiche von [start, end]."""
+        missing = []
+        cursor = start
+        for s, e, _ in self.intervals:
+            if e < cursor:
+                continue
+            if s > end:
+                break
+            if s > cursor:
+                missing.append((cursor, s - ONE_DAY))
+            cursor = max(cursor, e + ONE_DAY)
+            if cursor > end:
+                break
+        if cursor <= end:
+            missing.append((cursor, end))
+        return missing
+
+    def store(self, start, end, events, fetched_at):
+        # Events im neu geladenen Bereich komplett ersetzen (gelöschte verschwinden)
+        self.events = {
+            key: event for key, event in self.events.items()
+            if not _event_overlaps(event, start, end)
+        }
+        for event in events:
+            self.events[_event_key(event)] = event
+        self.intervals.append([start, end, fetched_at])
+        self._merge()
+
+    def _merge(self):
+        merged = []
+        for s, e, fetched_at in sorted(self.intervals):
+            if merged and s <= merged[-1][1] + ONE_DAY:
+                last = merged[-1]
+                last[1] = max(last[1], e)
+                # konservativ: das älteste Ladedatum bestimmt die Frische
+                last[2] = min(last[2], fetched_at)
+            else:
+                merged.append([s, e, fetched_at])
+        self.intervals = merged
+
+    def invalidate(self, start=None, end=None):
+        if start is None and end is None:
+            self.intervals = []
+            self.events = {}
+            return
+        start = start or date.min
+        end = end or date.max
+        remaining = []
+        for s, e, fetched_at in self.intervals:
+            if e < start or s > end:
+                remaining.append([s, e, fetched_at])
+                continue
+            if s < start:
+                remaining.append([s, start - ONE_DAY, fetched_at])
+            if e > end:
+                remaining.append([end + ONE_DAY, e, fetched_at])
+        self.intervals = remaining
+        self.events = {
+            key: event for key, event in self.events.items()
+            if not _event_overlaps(event, start, end)
+            or any(_event_overlaps(event, s, e) for s, e, _ in remaining)
+        }
+
+
+class CalendarIntervalCache:
+    """Intervall-Cache für Kalenderabfragen pro Account.
+
+    Bereits geladene Zeiträume werden gemerkt und überlappende oder
+    angrenzende Bereiche zusammengefasst. Eine Abfrage lädt nur die Lücken
+    nach, die noch nicht (oder nicht mehr frisch) abgedeckt sind. Blockiert
+    beim Nachladen und gehört daher in einen Thread.
+    """
+
+    def __init__(self, ttl=CALENDAR_CACHE_TTL):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._accounts = {}
+        self._lock = threading.Lock()
+
+    def _account(self, key):
+        with self._lock:
+            return self._accounts.setdefault(key, _AccountCalendar())
+
+    def get_events(self, key, start, end, fetch):
+        """Events im Bereich [start, end] (date, inklusive); fetch(start, end) lädt vom Server."""
+        account = self._account(key)
+        with account.lock:
+            now = time.monotonic()
+            account.drop_stale(now, self.ttl)
+            gaps = account.gaps(start, end)
+            if gaps:
+                self.misses += 1
+            else:
+                self.hits += 1
+            for gap_start, gap_end in gaps:
+                events = fetch(gap_start, gap_end)
+                account.store(gap_start, gap_end, events, now)
+
+            events = [e for e in account.events.values() if _event_overlaps(e, start, end)]
+        events.sort(key=lambda e: e.get("startDate") or [])
+        return events
+
+    def invalidate(self, key, start=None, end=None):
+        """Cache eines Accounts (ganz oder für einen Bereich) verwerfen."""
+        with self._lock:
+            account = self._accounts.get(key)
+        if account is None:
+            return
+        with account.lock:
+            account.invalidate(start, end)
+
+    def evict(self, key):
+        with self._lock:
+            self._accounts.pop(key, None)
+
+
+def to_date(value):
+    """ISO-Datum oder -Zeitpunkt als date."""
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).date()
@@ -0,0 +1,160 @@
+import os
+import json
+import asyncio
+
+from aiortc import RTCPeerConnection, RTCSessionDescription, RTCRtpSender
+from aiortc.contrib.media import MediaPlayer
+
+CAMERA_IDLE_TIMEOUT = float(os.getenv("CAMERA_IDLE_TIMEOUT", "30"))  # Sekunden ohne Zuschauer
+# false: H.264 von RTSP-Kameras wird unverändert weitergereicht (kein Dekodieren/Kodieren)
+CAMERA_DECODE = os.getenv("CAMERA_DECODE", "false").lower() in ("1", "true", "yes")
+
+
+def load_camera_sources():
+    """Kameras aus CAMERA_SOURCES: JSON {"name": "rtsp://..."} oder "name=url,name2=url2"."""
+    raw = os.getenv("CAMERA_SOURCES", "").strip()
+    if not raw:
+        return {}
+    if raw.startswith("{"):
+        return json.loads(raw)
+    sources = {}
+    for item in raw.split(","):
+        name, _, url = item.partition("=")
+        if name.strip() and url.strip():
+            sources[name.strip()] = url.strip()
+    return sources
+
+
+class _CameraSource:
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+        self.player = None
+        self.track = None
+        self.viewers = 0
+        self.idle_handle = None
+        self.opening = None
+
+
+class CameraHub:
+    """Öffnet jede Kamera genau einmal und verteilt sie per MediaRelay an beliebig viele Zuschauer.
+
+    Peer-Connections werden in `pcs` geführt und beim Verbindungsende wieder
+    entfernt. Eine Kamera ohne Zuschauer wird nach `idle_timeout` Sekunden
+    geschlossen.
+    """
+
+    def __init__(self, relay, pcs, sources=None, idle_timeout=CAMERA_IDLE_TIMEOUT, decode=CAMERA_DECODE):
+        self.relay = relay
+        self.pcs = pcs
+        self.idle_timeout = idle_timeout
+        self.decode = decode
+        self._sources = {
+            name: _CameraSource(name, url)
+            for name, url in (sources if sources is not None else load_camera_sources()).items()
+        }
+        self._peer_cameras = {}
+
+    def cameras(self):
+        return [
+            {"name": source.name, "live": source.player is not None, "viewers": source.viewers}
+            for source in self._sources.values()
+        ]
+
+    def _passthrough(self, url):
+        # MP4-Dateien enthalten H.264 im AVCC-Format, das aiortc nicht ohne Dekodieren paketiert
+        return not self.decode and url.startswith(("rtsp://", "rtsps://"))
+
+    def _open_player(self, url):
+        if url.startswith(("rtsp://", "rtsps://")):
+            return MediaPlayer(url, format="rtsp", options={"rtsp_transport": "tcp"}, decode=not self._passthrough(url))
+        return MediaPlayer(url, decode=True)
+
+    async def _acquire(self, name):
+        source = self._sources.get(name)
+        if source is None:
+            raise ValueError(f"Unbekannte Kamera: {name}")
+        source.viewers += 1
+        if source.idle_handle is not None:
+            source.idle_handle.cancel()
+            source.idle_handle = None
+        try:
+            if source.player is None:
+                # Mehrere gleichzeitige Zuschauer warten auf dasselbe Öffnen
+                if source.opening is None:
+                    source.opening = asyncio.ensure_future(asyncio.to_thread(self._open_player, source.url))
+                try:
+                    player = await asyncio.shield(source.opening)
+                finally:
+                    source.opening = None
+                if source.player is None:
+                    if player.video is None:
+                        raise ValueError(f"Kamera {name} liefert kein Video")
+                    source.player = player
+                    source.track = player.video
+            return self.relay.subscribe(source.track, buffered=False)
+        except Exception:
+            self._release(name)
+            raise
+
+    def _release(self, name):
+        source = self._sources[name]
+        source.viewers = max(0, source.viewers - 1)
+        if source.viewers == 0 and source.player is not None and source.idle_handle is None:
+            loop = asyncio.get_running_loop()
+            source.idle_handle = loop.call_later(self.idle_timeout, self._close_source, source)
+
+    def _close_source(self, source):
+        source.idle_handle = None
+        if source.viewers > 0 or source.player is None:
+            return
+        print(f"Kamera {source.name} ohne Zuschauer, wird geschlossen")
+        player, source.player, source.track = source.player, None, None
+        for track in (player.video, player.audio):
+            if track is not None:
+                track.stop()
+
+    async def handle_offer(self, camera, sdp, sdp_type="offer"):
+        """Erzeugt eine Peer-Connection für `camera` und liefert die Antwort-SDP."""
+        track = await self._acquire(camera)
+        pc = RTCPeerConnection()
+        self.pcs.add(pc)
+        self._peer_cameras[pc] = camera
+
+        @pc.on("connectionstatechange")
+        async def on_connectionstatechange():
+            if pc.connectionState in ("failed", "closed"):
+                await self.close_peer(pc)
+
+        try:
+            sender = pc.addTrack(track)
+            if self._passthrough(self._sources[camera].url):
+                # Ohne Dekodieren kann nur der Codec der Kamera (H.264) weitergereicht werden
+                transceiver = next(t for t in pc.getTransceivers() if t.sender == sender)
+                codecs = RTCRtpSender.getCapabilities("video").codecs
+                transceiver.setCodecPreferences([c for c in codecs if c.mimeType == "video/H264"])
+
+            await pc.setRemoteDescription(RTCSessionDescription(sdp=sdp, type=sdp_type))
+            answer = await pc.createAnswer()
+            await pc.setLocalDescription(answer)
+        except Exception:
+            await self.close_peer(pc)
+            raise
+        return pc, pc.localDescription
+
+    async def close_peer(self, pc):
+        camera = self._peer_cameras.pop(pc, None)
+        self.pcs.discard(pc)
+        if camera is not None:
+            self._release(camera)
+        await pc.close()
+
+    async def shutdown(self):
+        for pc in list(self.pcs):
+            await self.close_peer(pc)
+        for source in self._sources.values():
+            if source.idle_handle is not None:
+                source.idle_handle.cancel()
+            source.viewers = 0
+            if source.player is not None:
+                self._close_source(source)
@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import base64
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from modules.recordings import RECORDINGS_BASE_PATH, _group_key
+
+RECORDINGS_DB_PATH = os.getenv("RECORDINGS_DB_PATH", "data/recordings.db")
+
+# z.B. cam1_20250101_120000.mp4, cam1_2025-01-01T12-00-00.mp4
+_TIMESTAMP_RE = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[T_\- ]?(\d{2})[-:]?(\d{2})[-:]?(\d{2})")
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS recordings (
+    path TEXT PRIMARY KEY,
+    camera TEXT NOT NULL,
+    day TEXT NOT NULL,
+    start_ts REAL NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS recordings_camera_start ON recordings (camera, start_ts, path);
+CREATE INDEX IF NOT EXISTS recordings_start ON recordings (start_ts, path);
+"""
+
+# Per ALTER TABLE nachgerüstete Spalten (ältere Datenbanken werden beim Start migriert)
+_METADATA_COLUMNS = {
+    "duration": "REAL",
+    "width": "INTEGER",
+    "height": "INTEGER",
+    "codec": "TEXT",
+    "bitrate": "INTEGER",
+    "moov_offset": "INTEGER",
+    "faststart": "INTEGER",
+    "probed_mtime": "REAL",
+}
+
+
+def parse_start_timestamp(path):
+    """Startzeitpunkt (Unix-Zeit, lokale Zeitzone) aus dem Dateinamen lesen, sonst None."""
+    match = _TIMESTAMP_RE.search(os.path.basename(path))
+    if not match:
+        return None
+    try:
+        return datetime(*map(int, match.groups())).timestamp()
+    except ValueError:
+        return None
+
+
+def encode_cursor(start_ts, path):
+    raw = json.dumps([start_ts, path]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        start_ts, path = json.loads(base64.urlsafe_b64decode(padded))
+        return float(start_ts), str(path)
+    except Exception:
+        raise ValueError("Ungültiger Cursor")
+
+
+class RecordingsCatalog:
+    """Persistenter SQLite-Katalog aller Aufnahmen.
+
+    Wird als Listener am RecordingsIndex betrieben: Änderungen landen in einer
+    Queue und werden von einem Schreib-Thread gebündelt in einer Transaktion
+    geschrieben. Lesende Abfragen nutzen eigene Verbindungen pro Thread (WAL).
+    """
+
+    def __init__(self, db_path=RECORDINGS_DB_PATH, base_path=RECORDINGS_BASE_PATH):
+        self.db_path = db_path
+        self.base = Path(base_path)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._pending = queue.Queue()
+        self._writer = None
+
+        conn = self._connect()
+        conn.executescript(_SCHEMA)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(recordings)")}
+        for column, kind in _METADATA_COLUMNS.items():
+            if column not in existing:
+                try:
+                    conn.execute(f"ALTER TABLE recordings ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError as e:
+                    # ein anderer Worker hat die Spalte gerade angelegt
+                    if "duplicate column" not in str(e):
+                        raise
+        conn.commit()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # ---- Schreiben ------------------------------------------------------
+
+    def start(self):
+        self._writer = threading.Thread(target=self._write_loop, name="recordings-catalog", daemon=True)
+        self._writer.start()
+
+    def stop(self):
+        if self._writer is not None:
+            self._pending.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+
+    def on_index_event(self, event, path):
+        """Listener für RecordingsIndex.add_listener."""
+        self._pending.put((event, path, None))
+
+    def store_metadata(self, path, metadata):
+        """Ergebnis von media_probe.probe_clip übernehmen (über den Schreib-Thread)."""
+        self._pending.put(("probed", path, metadata))
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            item = self._pending.get()
+            if item is None:
+                break
+            batch = [item]
+            # alles, was sich inzwischen angesammelt hat, in einer Transaktion schreiben
+            while len(batch) < 5000:
+                try:
+                    item = self._pending.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._pending.put(None)
+                    break
+                batch.append(item)
+            try:
+                with conn:
+                    for item in batch:
+                        self._apply(conn, *item)
+            except Exception as e:
+                # Transaktion ist zurückgerollt: einzeln wiederholen, damit nur
+                # das fehlerhafte Event verloren geht
+                print(f"Fehler beim Schreiben des Aufnahme-Katalogs, {len(batch)} Events einzeln: {e}")
+                for event, path, metadata in batch:
+                    try:
+                        with conn:
+                            self._apply(conn, event, path, metadata)
+                    except Exception as e:
+                        print(f"Katalog-Event {event} für {path} verworfen: {e}")
+        conn.close()
+
+    def _apply(self, conn, event, path, metadata):
+        if event == "removed":
+            conn.execute("DELETE FROM recordings WHERE path = ?", (path,))
+        elif event == "probed":
+            self._update_metadata(conn, path, metadata)
+        else:
+            self._upsert(conn, path)
+
+    def _upsert(self, conn, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            conn.execute("DELETE FROM recordings WHERE path = ?", (path,))
+            return
+        camera, day = _group_key(self.base, Path(path))
+        start_ts = parse_start_timestamp(path)
+        if start_ts is None:
+            start_ts = st.st_mtime
+        conn.execute(
+            """
+            INSERT INTO recordings (path, camera, day, start_ts, size, mtime)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime = excluded.mtime
+            """,
+            (path, camera, day, start_ts, st.st_size, st.st_mtime),
+        )
+
+    def _update_metadata(self, conn, path, metadata):
+        columns = [c for c in _METADATA_COLUMNS if c != "probed_mtime"]
+        conn.execute(
+            f"""
+            UPDATE recordings SET {", ".join(f"{c} = ?" for c in columns)},
+                size = ?, mtime = ?, probed_mtime = ?
+            WHERE path = ?
+            """,
+            (*(metadata.get(c) for c in columns), metadata["size"], metadata["mtime"], metadata["mtime"], path),
+        )
+
+    # ---- Lesen ----------------------------------------------------------
+
+    def all_paths(self):
+        return [row[0] for row in self._reader().execute("SELECT path FROM recordings")]
+
+    def tree(self, camera=None, day=None):
+        """Kamera -> Tag -> Dateien wie RecordingsIndex.snapshot, direkt aus der Datenbank
+        (für Worker, die den Index nicht selbst führen)."""
+        clauses, params = [], []
+        if camera is not None:
+            clauses.append("camera = ?")
+            params.append(camera)
+        if day is not None:
+            clauses.append("day = ?")
+            params.append(day)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        result = {}
+        for cam, d, path in self._reader().execute(
+            f"SELECT camera, day, path FROM recordings {where} ORDER BY camera, day, path", params
+        ):
+            result.setdefault(cam, {}).setdefault(d, []).append(path)
+        return result
+
+    def query(self, camera=None, day=None, start=None, end=None, cursor=None,
+              limit=DEFAULT_PAGE_SIZE, order="asc"):
+        """Seitenweise Abfrage (Keyset-Pagination über start_ts, path).
+
+        Liefert (items, next_cursor); next_cursor ist None auf der letzten Seite.
+        """
+        if order not in ("asc", "desc"):
+            raise ValueError("order muss 'asc' oder 'desc' sein")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+        clauses, params = [], []
+        if camera is not None:
+            clauses.append("camera = ?")
+            params.append(camera)
+        if day is not None:
+            clauses.append("day = ?")
+            params.append(day)
+        if start is not None:
+            clauses.append("start_ts >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("start_ts <= ?")
+            params.append(end)
+        if cursor is not None:
+            cursor_ts, cursor_path = decode_cursor(cursor)
+            clauses.append("(start_ts, path) > (?, ?)" if order == "asc" else "(start_ts, path) < (?, ?)")
+            params.extend([cursor_ts, cursor_path])
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        direction = "ASC" if order == "asc" else "DESC"
+        rows = self._reader().execute(
+            f"SELECT * FROM recordings {where} ORDER BY start_ts {direction}, path {direction} LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+
+        items = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["start_ts"], last["path"])
+        return items, next_cursor
+
+    def segments(self, camera, start, end):
+        """Aufnahmen einer Kamera, die [start, end] abdecken, aufsteigend.
+
+        Enthält auch die letzte Aufnahme, die vor `start` beginnt, da sie den
+        Startzeitpunkt meist noch einschließt."""
+        conn = self._reader()
+        first = conn.execute(
+            "SELECT * FROM recordings WHERE camera = ? AND start_ts <= ? ORDER BY start_ts DESC, path DESC LIMIT 1",
+            (camera, start),
+        ).fetchall()
+        rest = conn.execute(
+            "SELECT * FROM recordings WHERE camera = ? AND start_ts > ? AND start_ts <= ? ORDER BY start_ts, path",
+            (camera, start, end),
+        ).fetchall()
+        return [dict(row) for row in first + rest]
+
+    def unprobed(self, limit=100):
+        """Aufnahmen ohne (aktuelle) Metadaten, neueste zuerst."""
+        rows = self._reader().execute(
+            """
+            SELECT path FROM recordings
+            WHERE probed_mtime IS NULL OR probed_mtime != mtime
+            ORDER BY start_ts DESC LIMIT ?
+            """,
+            (limit,),
+        )
+        return [row[0] for row in rows]
+
+    def faststart_candidates(self, older_than, limit=10):
+        """Fertig geschriebene Aufnahmen mit moov-Atom am Dateiende."""
+        rows = self._reader().execute(
+            """
+            SELECT path FROM recordings
+            WHERE faststart = 0 AND probed_mtime = mtime AND mtime < ?
+            ORDER BY start_ts DESC LIMIT ?
+            """,
+            (older_than, limit),
+        )
+        return [row[0] for row in rows]
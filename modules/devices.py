@@ -0,0 +1,121 @@
+import os
+import time
+import asyncio
+
+from modules.icloud import credentials_key
+
+ICLOUD_DEVICE_REFRESH_INTERVAL = float(os.getenv("ICLOUD_DEVICE_REFRESH_INTERVAL", "60"))  # Sekunden
+ICLOUD_DEVICE_IDLE_TIMEOUT = float(os.getenv("ICLOUD_DEVICE_IDLE_TIMEOUT", "600"))  # Sekunden
+
+
+class DeviceSnapshot:
+    def __init__(self, devices, updated_at):
+        self.devices = devices
+        self.updated_at = updated_at
+
+    @property
+    def age(self):
+        return max(0.0, time.time() - self.updated_at)
+
+    def to_dict(self):
+        return {"devices": self.devices, "updated_at": self.updated_at, "age": round(self.age, 1)}
+
+
+class _AccountDevices:
+    def __init__(self, email, password):
+        self.email = email
+        self.password = password
+        self.snapshot = None
+        self.inflight = None
+        self.task = None
+        self.subscribers = set()
+        self.last_access = time.monotonic()
+
+
+class DeviceRefresher:
+    """Hält pro Account einen aktuellen Geräte-Snapshot im Hintergrund.
+
+    Pro Durchlauf gibt es genau eine Abfrage aller Geräte des Accounts
+    (refreshClient). Anfragen bekommen sofort den letzten Snapshot,
+    Abonnenten (WebSocket) werden bei Änderungen benachrichtigt. Accounts ohne
+    Zugriffe und Abonnenten werden nach `idle_timeout` nicht mehr aktualisiert.
+    """
+
+    def __init__(self, pool, offload, interval=ICLOUD_DEVICE_REFRESH_INTERVAL,
+                 idle_timeout=ICLOUD_DEVICE_IDLE_TIMEOUT):
+        self.pool = pool
+        self.offload = offload
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self._accounts = {}
+
+    def _account(self, email, password):
+        key = credentials_key(email, password)
+        account = self._accounts.get(key)
+        if account is None:
+            account = self._accounts[key] = _AccountDevices(email, password)
+        account.last_access = time.monotonic()
+        if account.task is None or account.task.done():
+            account.task = asyncio.create_task(self._run(key, account), name="icloud-devices")
+        return account
+
+    async def get(self, email, password, fresh=False):
+        """Letzter Snapshot; beim ersten Aufruf oder mit fresh=True wird neu geladen."""
+        account = self._account(email, password)
+        if fresh or account.snapshot is None:
+            await self._refresh(account)
+        return account.snapshot
+
+    def subscribe(self, email, password):
+        account = self._account(email, password)
+        queue = asyncio.Queue(maxsize=1)
+        account.subscribers.add(queue)
+        if account.snapshot is not None:
+            queue.put_nowait(account.snapshot)
+        return queue
+
+    def unsubscribe(self, email, password, queue):
+        account = self._accounts.get(credentials_key(email, password))
+        if account is not None:
+            account.subscribers.discard(queue)
+            account.last_access = time.monotonic()
+
+    async def _refresh(self, account):
+        # Läuft bereits eine Abfrage, auf deren Ergebnis warten statt doppelt zu laden
+        if account.inflight is not None:
+            return await asyncio.shield(account.inflight)
+        account.inflight = asyncio.ensure_future(self._load(account))
+        account.inflight.add_done_callback(lambda _: setattr(account, "inflight", None))
+        return await asyncio.shield(account.inflight)
+
+    async def _load(self, account):
+        devices = await self.offload.run(
+            self.pool.call, account.email, account.password,
+            lambda service: service.get_devices(),
+            operation="devices",
+        )
+        changed = account.snapshot is None or devices != account.snapshot.devices
+        account.snapshot = DeviceSnapshot(devices, time.time())
+        if changed:
+            for queue in list(account.subscribers):
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(account.snapshot)
+        return account.snapshot
+
+    async def _run(self, key, account):
+        while True:
+            await asyncio.sleep(self.interval)
+            idle = time.monotonic() - account.last_access > self.idle_timeout
+            if idle and not account.subscribers:
+                self._accounts.pop(key, None)
+                return
+            try:
+                await self._refresh(account)
+            except Exception as e:
+                print(f"Fehler beim Aktualisieren der Geräte: {e}")
+
+    def stop(self):
+        for account in self._accounts.values():
+            if account.task is not None:
+                account.task.cancel()
@@ -0,0 +1,180 @@
+import os
+import time
+import hashlib
+import uuid
+import fcntl
+import threading
+from collections import OrderedDict
+
+STALE_PART_AGE = 3600  # Sekunden; ältere .part-Dateien gelten auch bei lebender PID als verwaist
+RESCAN_INTERVAL = 60  # Sekunden; spätestens dann gleicht commit() mit dem Verzeichnis ab
+# Lock-Dateien liegen außerhalb der Cache-Verzeichnisse (static/audio wird direkt ausgeliefert)
+CACHE_LOCK_DIR = os.getenv("CACHE_LOCK_DIR", "data/locks")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class DiskLRUCache:
+    """Dateibasierter Cache mit LRU-Verdrängung nach Gesamtgröße in Bytes.
+
+    Schlüssel sind Dateinamen innerhalb von `directory`. Neue Einträge werden
+    zuerst in eine temporäre Datei geschrieben und erst mit `commit` atomar
+    übernommen, halb geschriebene Dateien sind also nie sichtbar.
+
+    Mehrere Prozesse (uvicorn-Worker) dürfen sich ein Verzeichnis teilen:
+    temporäre Dateien tragen die PID des Schreibers und werden nur entfernt,
+    wenn dieser nicht mehr läuft (oder sie verwaist älter als
+    STALE_PART_AGE sind). Verdrängt wird unter einem flock auf eine
+    Lock-Datei pro Verzeichnis in CACHE_LOCK_DIR nach einem frischen Scan
+    des Verzeichnisses, sodass `max_bytes` für alle Prozesse zusammen gilt. Die LRU-Reihenfolge ist die mtime, die
+    `get` bei jedem Treffer auffrischt.
+
+    `commit` zählt nur lokal mit und scannt erst, wenn diese Schätzung
+    `max_bytes` überschreitet oder der letzte Scan `rescan_interval`
+    Sekunden zurückliegt; Einträge anderer Prozesse tauchen also mit
+    Verzögerung in der Summe auf.
+    """
+
+    def __init__(self, directory, max_bytes, rescan_interval=RESCAN_INTERVAL, lock_dir=CACHE_LOCK_DIR):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(lock_dir, exist_ok=True)
+        digest = hashlib.sha1(os.path.abspath(directory).encode()).hexdigest()[:16]
+        self._lock_path = os.path.join(lock_dir, f"cache-{digest}.lock")
+        self._remove_orphaned_parts()
+        self._evict()
+
+    def path_for(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Pfad des Eintrags (und als zuletzt benutzt markieren) oder None.
+
+        Findet auch Einträge, die ein anderer Prozess angelegt hat."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # nie vorhanden oder von einem anderen Prozess verdrängt
+            with self._lock:
+                self.total_bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+        return path
+
+    def temp_path(self, key):
+        return self.path_for(f"{key}.{os.getpid()}.{uuid.uuid4().hex}.part")
+
+    def commit(self, key, temp_path):
+        """Übernimmt eine fertig geschriebene temporäre Datei als Eintrag."""
+        path = self.path_for(key)
+        size = os.stat(temp_path).st_size
+        os.replace(temp_path, path)
+        with self._lock:
+            self.total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            rescan = self.total_bytes > self.max_bytes or \
+                time.monotonic() - self._last_scan >= self.rescan_interval
+        if rescan:
+            self._evict()
+        return path
+
+    def discard(self, key):
+        with self._lock:
+            self.total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self.path_for(key))
+        except FileNotFoundError:
+            pass
+
+    def _remove_orphaned_parts(self):
+        # Reste abgebrochener Schreibvorgänge; laufende anderer Prozesse bleiben liegen
+        now = time.time()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".part") or not entry.is_file():
+                    continue
+                parts = entry.name.rsplit(".", 3)
+                try:
+                    pid = int(parts[1]) if len(parts) == 4 else None
+                except ValueError:
+                    pid = None  # altes Namensschema ohne PID
+                try:
+                    if pid is not None and _pid_alive(pid) and now - entry.stat().st_mtime <= STALE_PART_AGE:
+                        continue
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+
+    def _scan(self):
+        """Fertige Einträge im Verzeichnis als [(mtime, key, size)], älteste zuerst."""
+        existing = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or entry.name.endswith(".part"):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except FileNotFoundError:
+                    continue  # gerade von einem anderen Prozess entfernt
+                existing.append((st.st_mtime, entry.name, st.st_size))
+        existing.sort()
+        return existing
+
+    def _evict(self):
+        fd = os.open(self._lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            # flock gilt pro geöffneter Datei: schließt andere Prozesse und Threads aus
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            entries = OrderedDict((key, size) for _, key, size in self._scan())
+            total = sum(entries.values())
+            evicted = 0
+            while total > self.max_bytes and entries:
+                key, size = entries.popitem(last=False)
+                total -= size
+                evicted += 1
+                try:
+                    os.remove(self.path_for(key))
+                except FileNotFoundError:
+                    pass
+        finally:
+            os.close(fd)
+        with self._lock:
+            self._entries = entries
+            self.total_bytes = total
+            self.evictions += evicted
+            self._last_scan = time.monotonic()
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -1,22 +1,44 @@
 import os
 import sys
-import click
+import time
+import hashlib
+import threading
 
 from dotenv import load_dotenv
-from pyicloud import PyiCloudService
 from datetime import datetime
 
+from modules.metrics import observe_upstream
+
+ICLOUD_COOKIE_DIR = os.getenv("ICLOUD_COOKIE_DIR", "data/icloud")
+ICLOUD_SESSION_TTL = float(os.getenv("ICLOUD_SESSION_TTL", "1800"))  # Sekunden ohne Nutzung
+
+# Felder, die AppleDevice.status() liefert
+_DEVICE_STATUS_FIELDS = ("batteryLevel", "deviceDisplayName", "deviceStatus", "name")
+
+# pyicloud wird erst beim ersten Login importiert, das spart beim Start spürbar Zeit
+PyiCloudService = None
+
+def _service_class():
+    global PyiCloudService
+    if PyiCloudService is None:
+        from pyicloud import PyiCloudService as service_class
+        PyiCloudService = service_class
+    return PyiCloudService
+
 class iCloudService:
-    def __init__(self, email=None, password=None):
+    def __init__(self, email=None, password=None, cookie_directory=None):
         self.email = email
         self.password = password
+        self.cookie_directory = cookie_directory
         self.api = None
         self.authenticated = False
 
     def authenticate(self):
         """Einmalige Authentifizierung durchführen"""
         if not self.api:
-            self.api = PyiCloudService(self.email, self.password)
+            if self.cookie_directory:
+                os.makedirs(self.cookie_directory, mode=0o700, exist_ok=True)
+            self.api = _service_class()(self.email, self.password, cookie_directory=self.cookie_directory)
 
             # Zwei-Faktor-Authentifizierung
             if self.api.requires_2fa:
@@ -46,6 +68,8 @@ class iCloudService:
                 print("Failed to request trust. You will likely be prompted for the code again in the coming weeks")
 
     def _handle_2sa(self):
+        import click
+
         devices = self.api.trusted_devices
         for i, device in enumerate(devices):
             print(f"  {i}: {device.get('deviceName', 'SMS to %s' % device.get('phoneNumber'))}")
@@ -71,31 +95,33 @@ class iCloudService:
 
     def get_devices(self):
         """Get the status of all icloud devices.
-        Returns a list of dictionaries containing device information."""
-        
-        devices_info = []
-        for device in self.api.devices:
-            device_data = {
-                'id': device['id'],
-                'name': device['name'],
-                'content': device.content,
-                'data': device.data,
-                'message_url': device.message_url,
-                'sound_url': device.sound_url,
-                'location': device.location(),
-                'status': device.status(),
-            }
-            devices_info.append(device_data)
-        
-        return devices_info
+        Returns a list of dictionaries containing device information.
+        Der Geräte-Manager lädt beim Anlegen einmal alle Geräte (refreshClient);
+        Standort und Status kommen danach aus device.content, da location() und
+        status() jeweils erneut den ganzen Account abfragen würden."""
+        return [self._device_info(device) for device in list(self.api.devices)]
+
+    def _device_info(self, device):
+        content = device.content
+        return {
+            'id': content['id'],
+            'name': content['name'],
+            'content': content,
+            'data': device.data,
+            'message_url': device.message_url,
+            'sound_url': device.sound_url,
+            'location': content.get('location'),
+            'status': {field: content.get(field) for field in _DEVICE_STATUS_FIELDS},
+        }
 
     def convert_to_datetime(self, date_list):
         return datetime(date_list[1], date_list[2], date_list[3], date_list[4], date_list[5], date_list[6] // 1000)
 
 
-    def get_calendar_events_in_range(self, range):
+    def get_calendar_events_in_range(self, range, cache=None):
+        """Get a list of calendar events.
+        Mit `cache` (CalendarIntervalCache) werden nur noch nicht geladene Zeiträume abgefragt."""
         print('range',range)
-        print(self.api.devices)
 
         # print("Contacts")
         # for c in self.api.contacts.all():
@@ -108,7 +134,17 @@ class iCloudService:
         end = datetime.fromisoformat(range.end)
         print(start)
         print(end)
-        """Get a list of calendar events."""
+        if cache is not None:
+            return cache.get_events(
+                credentials_key(self.email, self.password),
+                start.date(),
+                end.date(),
+                self.fetch_calendar_events,
+            )
+        return self.fetch_calendar_events(start, end)
+
+    def fetch_calendar_events(self, start, end):
+        """Events direkt bei iCloud abfragen (Tagesgenauigkeit, beide Tage inklusive)."""
         events = self.api.calendar.events(start, end)
         event_details = []
 
@@ -117,6 +153,92 @@ class iCloudService:
         return event_details
 
 
+def credentials_key(email, password):
+    """Pool-Schlüssel: Hash der Zugangsdaten, damit diese nirgends im Klartext als Key liegen."""
+    return hashlib.sha256(f"{email}\0{password}".encode()).hexdigest()
+
+class _PooledSession:
+    def __init__(self, service):
+        self.service = service
+        self.last_used = time.monotonic()
+
+class iCloudSessionPool:
+    """Wiederverwendbare, authentifizierte iCloudService-Instanzen pro Account.
+
+    Sessions werden über einen Hash der Zugangsdaten gefunden, die
+    Cookie-/Session-Dateien liegen pro Account unter `cookie_directory`, damit
+    ein Neustart keinen neuen Login (und keine 2FA-Abfrage) auslöst. Ein Lock
+    pro Account verhindert parallele Logins; unbenutzte Sessions fliegen nach
+    `ttl` Sekunden raus. Alle Methoden blockieren und gehören in einen Thread.
+    """
+
+    def __init__(self, ttl=ICLOUD_SESSION_TTL, cookie_directory=ICLOUD_COOKIE_DIR):
+        self.ttl = ttl
+        self.cookie_directory = cookie_directory
+        self._sessions = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _account_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def acquire(self, email, password):
+        """Authentifizierte Session holen, bei Bedarf einloggen."""
+        self.evict_idle()
+        key = credentials_key(email, password)
+        with self._account_lock(key):
+            entry = self._sessions.get(key)
+            if entry is None:
+                service = iCloudService(
+                    email=email,
+                    password=password,
+                    cookie_directory=os.path.join(self.cookie_directory, key[:16]),
+                )
+                with observe_upstream("icloud", "login"):
+                    service.authenticate()
+                entry = _PooledSession(service)
+                with self._lock:
+                    self._sessions[key] = entry
+            entry.last_used = time.monotonic()
+            return entry.service
+
+    def call(self, email, password, fn, operation="call", retry=True):
+        """fn(service) mit gepoolter Session ausführen; bei abgelaufener Session einmal neu einloggen.
+        Die Dauer landet unter `operation` in den Upstream-Metriken.
+
+        Mit retry=False (für nicht idempotente Aufrufe wie Klingeln) wird nach
+        einem Fehler nur die Session verworfen und nicht erneut ausgeführt, da
+        Apple den Auftrag womöglich schon angenommen hat."""
+        from pyicloud.exceptions import PyiCloudAPIResponseException, PyiCloudFailedLoginException
+
+        service = self.acquire(email, password)
+        try:
+            with observe_upstream("icloud", operation):
+                return fn(service)
+        except (PyiCloudAPIResponseException, PyiCloudFailedLoginException):
+            self.invalidate(email, password)
+            if not retry:
+                raise
+            service = self.acquire(email, password)
+            with observe_upstream("icloud", operation):
+                return fn(service)
+
+    def invalidate(self, email, password):
+        key = credentials_key(email, password)
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            for key, entry in list(self._sessions.items()):
+                if now - entry.last_used > self.ttl:
+                    del self._sessions[key]
+
+    def __len__(self):
+        return len(self._sessions)
+
 # Beispiel der Nutzung
 if __name__ == "__main__":
     iphone_service = IphoneService()
@@ -0,0 +1,218 @@
+import os
+import time
+import shutil
+import struct
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+CLIP_PROBE_INTERVAL = float(os.getenv("CLIP_PROBE_INTERVAL", "30"))  # Sekunden zwischen zwei Durchläufen
+CLIP_PROBE_BATCH = int(os.getenv("CLIP_PROBE_BATCH", "200"))
+CLIP_WORKERS = int(os.getenv("CLIP_WORKERS", "1"))
+# Faststart-Remux schreibt die Aufnahmen neu; nur auf Wunsch, da die Originaldatei ersetzt wird
+CLIP_FASTSTART = os.getenv("CLIP_FASTSTART", "false").lower() in ("1", "true", "yes")
+CLIP_FASTSTART_MIN_AGE = float(os.getenv("CLIP_FASTSTART_MIN_AGE", "600"))  # Sekunden seit letzter Änderung
+CLIP_IDLE_AFTER = float(os.getenv("CLIP_IDLE_AFTER", "120"))  # Sekunden ohne Video-Anfragen
+CLIP_IDLE_MAX_LOAD = float(os.getenv("CLIP_IDLE_MAX_LOAD", "0.5"))  # Load je CPU
+
+_FASTSTART_SUFFIX = ".faststart.part"
+
+
+def read_top_level_atoms(path):
+    """Top-Level-Atome einer MP4-Datei als [(typ, offset, größe)], ohne die Daten zu lesen."""
+    atoms = []
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        offset = 0
+        while offset + 8 <= file_size:
+            f.seek(offset)
+            header = f.read(16)
+            if len(header) < 8:
+                break
+            size, kind = struct.unpack(">I4s", header[:8])
+            if size == 1:
+                if len(header) < 16:
+                    break
+                size = struct.unpack(">Q", header[8:16])[0]
+            elif size == 0:
+                size = file_size - offset  # reicht bis zum Dateiende
+            if size < 8:
+                break  # kaputt oder noch im Schreiben
+            atoms.append((kind.decode("latin-1"), offset, size))
+            offset += size
+    return atoms
+
+
+def probe_clip(path):
+    """Dauer, Auflösung, Codec, Bitrate und Lage des moov-Atoms (läuft im Worker-Prozess).
+
+    faststart ist 1, wenn moov vor mdat liegt, 0 bei moov am Ende und None,
+    wenn eines der Atome fehlt (Datei unvollständig)."""
+    st = os.stat(path)
+    metadata = {"size": st.st_size, "mtime": st.st_mtime}
+
+    offsets = {}
+    for kind, offset, _ in read_top_level_atoms(path):
+        offsets.setdefault(kind, offset)
+    moov, mdat = offsets.get("moov"), offsets.get("mdat")
+    metadata["moov_offset"] = moov
+    metadata["faststart"] = None if moov is None or mdat is None else int(moov < mdat)
+
+    try:
+        import av
+
+        with av.open(path) as container:
+            metadata["duration"] = container.duration / av.time_base if container.duration else None
+            metadata["bitrate"] = container.bit_rate or None
+            if container.streams.video:
+                codec_context = container.streams.video[0].codec_context
+                metadata.update(codec=codec_context.name, width=codec_context.width, height=codec_context.height)
+    except Exception as e:
+        print(f"Metadaten für {path} nicht lesbar: {e}")
+    return metadata
+
+
+def make_faststart(path):
+    """Schreibt die Datei per Stream-Copy mit moov am Anfang neu (läuft im Worker-Prozess).
+
+    Die Rechte bleiben erhalten, die Änderungszeit nicht: ETag und
+    Last-Modified müssen sich ändern, sonst setzen Clients per If-Range
+    einen Download mit Bytes der alten Datei fort. Dateien mit weiteren
+    Spuren (Daten, Timecode, Untertitel) werden nicht angefasst, da das
+    MP4-Muxing diese nicht verlustfrei übernimmt. Hat sich die Datei
+    währenddessen verändert, wird das Ergebnis verworfen und False geliefert."""
+    import av
+
+    before = os.stat(path)
+    temp_path = path + _FASTSTART_SUFFIX
+    with av.open(path) as source:
+        others = sorted({s.type for s in source.streams if s.type not in ("video", "audio")})
+    if others:
+        raise ValueError(f"enthält weitere Spuren ({', '.join(others)}), wird nicht umgeschrieben")
+    try:
+        with av.open(path) as source, \
+                av.open(temp_path, "w", format="mp4", options={"movflags": "faststart"}) as target:
+            streams = list(source.streams)
+            mapping = {s.index: target.add_stream_from_template(s) for s in streams}
+            for packet in source.demux(streams):
+                if packet.dts is None:
+                    continue
+                packet.stream = mapping[packet.stream.index]
+                target.mux(packet)
+
+        after = os.stat(path)
+        if (after.st_size, after.st_mtime_ns) != (before.st_size, before.st_mtime_ns):
+            os.remove(temp_path)
+            return False
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+        return True
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+class ClipMaintenance:
+    """Hintergrund-Job für den Aufnahme-Katalog.
+
+    Liest von jeder Aufnahme die Metadaten (Prozess-Pool) und schreibt sie in
+    den Katalog. Aufnahmen mit moov am Ende werden in Leerlaufzeiten – keine
+    Video-Anfragen seit `CLIP_IDLE_AFTER` und geringe Systemlast – nach
+    `CLIP_FASTSTART_MIN_AGE` zu Faststart-MP4s umgeschrieben, sofern
+    `CLIP_FASTSTART` gesetzt ist.
+    """
+
+    def __init__(self, catalog, workers=CLIP_WORKERS, interval=CLIP_PROBE_INTERVAL,
+                 faststart=CLIP_FASTSTART, min_age=CLIP_FASTSTART_MIN_AGE):
+        self.catalog = catalog
+        self.workers = workers
+        self.interval = interval
+        self.faststart = faststart
+        self.min_age = min_age
+        self.last_activity = 0.0
+        self.probed = 0
+        self.remuxed = 0
+        self._failed = set()  # nicht remuxbar, bis zum Neustart nicht erneut versuchen
+        self._pool = None
+        self._task = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn statt fork: der Elternprozess hat Threads (watchdog, Katalog)
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    def note_activity(self):
+        """Von Video-Endpunkten aufgerufen: solange abgespielt wird, kein Remux."""
+        self.last_activity = time.monotonic()
+
+    def is_idle(self):
+        if time.monotonic() - self.last_activity < CLIP_IDLE_AFTER:
+            return False
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1) < CLIP_IDLE_MAX_LOAD
+        except OSError:
+            return True
+
+    def start(self):
+        self._task = asyncio.create_task(self._run(), name="clip-maintenance")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self._probe_pending()
+                if self.faststart and self.is_idle():
+                    await self._remux_pending()
+            except BrokenProcessPool:
+                # z.B. Worker vom OOM-Killer beendet: beim nächsten Durchlauf neuen Pool anlegen
+                print("Prozess-Pool der Aufnahme-Wartung abgestürzt, wird neu gestartet")
+                self._pool = None
+            except Exception as e:
+                print(f"Fehler bei der Aufnahme-Wartung: {e}")
+
+    async def _probe(self, path):
+        loop = asyncio.get_running_loop()
+        try:
+            metadata = await loop.run_in_executor(self._get_pool(), probe_clip, path)
+        except OSError:
+            return None  # inzwischen gelöscht, der Index räumt auf
+        self.catalog.store_metadata(path, metadata)
+        self.probed += 1
+        return metadata
+
+    async def _probe_pending(self):
+        paths = await asyncio.to_thread(self.catalog.unprobed, CLIP_PROBE_BATCH)
+        for path in paths:
+            await self._probe(path)
+
+    async def _remux_pending(self):
+        loop = asyncio.get_running_loop()
+        older_than = time.time() - self.min_age
+        paths = await asyncio.to_thread(self.catalog.faststart_candidates, older_than)
+        for path in paths:
+            if not self.is_idle():
+                return
+            if path in self._failed:
+                continue
+            try:
+                done = await loop.run_in_executor(self._get_pool(), make_faststart, path)
+            except Exception as e:
+                print(f"Faststart für {path} fehlgeschlagen: {e}")
+                self._failed.add(path)
+                continue
+            if done:
+                self.remuxed += 1
+                print(f"Faststart: {path}")
+            await self._probe(path)
@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import bisect
+import threading
+from collections import Counter as _Tally
+from contextlib import contextmanager
+
+from starlette.routing import Match
+
+# Profiler-Endpunkte nur auf Wunsch freischalten (zeigen Code-Pfade der App)
+METRICS_PROFILER = os.getenv("METRICS_PROFILER", "false").lower() in ("1", "true", "yes")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SEND_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_labels(self.label_names, label_values)} {value}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), collect=None):
+        """Mit `collect` wird der Wert erst beim Abruf gelesen: collect() -> [(label_werte, wert)]."""
+        super().__init__(name, help, labels)
+        self._values = {}
+        self._collect = collect
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values, amount=1):
+        self.inc(*label_values, amount=-amount)
+
+    def _samples(self):
+        if self._collect is not None:
+            items = list(self._collect())
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for label_values, value in items:
+            yield f"{self.name}{_labels(self.label_names, label_values)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label_werte -> [zähler je Bucket..., +Inf], summe
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for label_values, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, label_values)} {total}"
+            yield f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Alle Metriken im Prometheus-Textformat (Version 0.0.4)."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Dauer der HTTP-Anfragen bis zum Ende der Antwort",
+    ("method", "route", "status"),
+))
+WEBSOCKET_CONNECTIONS = REGISTRY.register(Gauge(
+    "websocket_connections", "Offene WebSocket-Verbindungen", ("route",),
+))
+WEBSOCKET_MESSAGES = REGISTRY.register(Counter(
+    "websocket_messages_sent_total", "Gesendete WebSocket-Nachrichten", ("route",),
+))
+WEBSOCKET_BYTES = REGISTRY.register(Counter(
+    "websocket_bytes_sent_total", "Gesendete WebSocket-Nutzdaten in Bytes", ("route",),
+))
+WEBSOCKET_SEND_DURATION = REGISTRY.register(Histogram(
+    "websocket_send_duration_seconds", "Dauer eines WebSocket-Sendeaufrufs", ("route",), buckets=SEND_BUCKETS,
+))
+WEBSOCKET_FRAMES_DROPPED = REGISTRY.register(Counter(
+    "websocket_frames_dropped_total", "Verworfene veraltete Frames für langsame Clients", ("stream",),
+))
+WEBSOCKET_SLOW_DISCONNECTS = REGISTRY.register(Counter(
+    "websocket_slow_client_disconnects_total", "Wegen voller Sende-Queue getrennte Verbindungen", ("stream",),
+))
+UPSTREAM_DURATION = REGISTRY.register(Histogram(
+    "upstream_request_duration_seconds", "Dauer von Aufrufen externer Dienste (iCloud, OpenAI)",
+    ("service", "operation", "outcome"),
+))
+
+
+@contextmanager
+def observe_upstream(service, operation):
+    """Misst einen Aufruf an einen externen Dienst; outcome ist ok oder error."""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, service, operation, outcome)
+
+
+# ---- Middleware -----------------------------------------------------------
+
+class MetricsMiddleware:
+    """Reine ASGI-Middleware: Dauer pro HTTP-Route, Nachrichten/Bytes/Sendedauer pro WebSocket-Route.
+
+    Als Label dient das Routen-Muster, nicht der konkrete Pfad; unbekannte
+    Pfade landen gesammelt unter "unmatched"."""
+
+    def __init__(self, app):
+        self.app = app
+        self._route_cache = {}
+
+    def _route(self, scope):
+        key = (scope["type"], scope["path"])
+        route = self._route_cache.get(key)
+        if route is None:
+            route = "unmatched"
+            for candidate in getattr(scope.get("app"), "routes", ()):
+                match, _ = candidate.matches(scope)
+                if match == Match.FULL:
+                    route = candidate.path
+                    break
+            if route != "unmatched" or len(self._route_cache) < 1024:
+                self._route_cache[key] = route
+        return route
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _http(self, scope, receive, send):
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - started, scope["method"], self._route(scope), status,
+            )
+
+    async def _websocket(self, scope, receive, send):
+        route = self._route(scope)
+        accepted = False
+
+        async def send_wrapper(message):
+            nonlocal accepted
+            kind = message["type"]
+            if kind == "websocket.send":
+                payload = message.get("bytes")
+                size = len(payload) if payload is not None else len(message.get("text", "").encode())
+                started = time.perf_counter()
+                await send(message)
+                WEBSOCKET_SEND_DURATION.observe(time.perf_counter() - started, route)
+                WEBSOCKET_MESSAGES.inc(route)
+                WEBSOCKET_BYTES.inc(route, amount=size)
+                return
+            if kind == "websocket.accept" and not accepted:
+                accepted = True
+                WEBSOCKET_CONNECTIONS.inc(route)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if accepted:
+                WEBSOCKET_CONNECTIONS.dec(route)
+
+
+# ---- Profiler -------------------------------------------------------------
+
+class SamplingProfiler:
+    """Stichproben-Profiler, zur Laufzeit an- und abschaltbar.
+
+    Ein Thread liest alle `interval` Sekunden die Stacks aller Threads
+    (sys._current_frames) und zählt sie. Ergebnis im "folded"-Format
+    (thread;datei:funktion;... anzahl), direkt für flamegraph.pl/speedscope.
+    """
+
+    def __init__(self):
+        self.interval = None
+        self.samples = 0
+        self.started_at = None
+        self._stacks = _Tally()
+        self._stacks_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval=0.01):
+        if self.running:
+            return False
+        self.interval = interval
+        self.samples = 0
+        self.started_at = time.time()
+        self._stacks = _Tally()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                with self._stacks_lock:
+                    self._stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def folded(self):
+        with self._stacks_lock:
+            stacks = self._stacks.most_common()
+        return "\n".join(f"{stack} {count}" for stack, count in stacks) + "\n"
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "samples": self.samples,
+            "started_at": self.started_at,
+            "stacks": len(self._stacks),
+        }
@@ -0,0 +1,112 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+
+
+class OffloadRejected(HTTPException):
+    """Warteschlange des Pools ist voll -> 503 statt weiter aufzustauen."""
+
+    def __init__(self, name):
+        super().__init__(status_code=503, detail=f"Überlastet: {name}", headers={"Retry-After": "1"})
+
+
+class OffloadTimeout(HTTPException):
+    """Aufruf hat das Zeitlimit überschritten -> 504."""
+
+    def __init__(self, name):
+        super().__init__(status_code=504, detail=f"Zeitüberschreitung: {name}")
+
+
+class BoundedExecutor:
+    """Begrenzter Thread-Pool für blockierende Aufrufe aus async-Endpunkten.
+
+    Höchstens `max_workers` Aufrufe laufen gleichzeitig, weitere `max_queue`
+    warten; alles darüber wird sofort mit OffloadRejected abgelehnt. Jeder
+    Aufruf hat ein Zeitlimit. Ein abgelaufener Aufruf läuft im Thread weiter
+    (Python kann Threads nicht abbrechen) und belegt bis dahin seinen Platz.
+    """
+
+    def __init__(self, name, max_workers, max_queue, timeout):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"offload-{name}")
+        self._lock = threading.Lock()
+        self.pending = 0  # eingereicht, noch nicht fertig (wartend + laufend)
+        self.active = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.peak_pending = 0
+
+    @classmethod
+    def from_env(cls, name, max_workers, max_queue, timeout):
+        """Werte aus OFFLOAD_<NAME>_WORKERS/_QUEUE/_TIMEOUT überschreiben die Vorgaben."""
+        prefix = f"OFFLOAD_{name.upper()}_"
+        return cls(
+            name,
+            max_workers=int(os.getenv(prefix + "WORKERS", max_workers)),
+            max_queue=int(os.getenv(prefix + "QUEUE", max_queue)),
+            timeout=float(os.getenv(prefix + "TIMEOUT", timeout)),
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self.active += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _done(self, future):
+        self.pending -= 1
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        if self.pending >= self.capacity:
+            self.rejected += 1
+            raise OffloadRejected(self.name)
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        self.submitted += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        future = loop.run_in_executor(self._executor, self._call, fn, args, kwargs)
+        future.add_done_callback(self._done)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise OffloadTimeout(self.name)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "queue_limit": self.max_queue,
+            "active": self.active,
+            "queued": max(0, self.pending - self.active),
+            "saturation": round(self.pending / self.capacity, 3),
+            "peak_pending": self.peak_pending,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,17 @@
 import os
-from openai import OpenAI
+import re
+import json
+import time
+import asyncio
+import hashlib
+from typing import Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import tempfile
+from pydantic import BaseModel, Field
+from fastapi import WebSocketDisconnect
+
+from modules.disk_cache import DiskLRUCache
+from modules.metrics import UPSTREAM_DURATION
 
 load_dotenv()
 
@@ -9,41 +19,255 @@ load_dotenv()
 STATIC_AUDIO_DIR = "static/audio"
 os.makedirs(STATIC_AUDIO_DIR, exist_ok=True)
 
+TTS_PERSIST_AUDIO = os.getenv("TTS_PERSIST_AUDIO", "true").lower() not in ("0", "false", "no")
+TTS_CHUNK_SIZE = int(os.getenv("TTS_CHUNK_SIZE", "4096"))  # Bytes pro WebSocket-Frame
+TTS_MODEL = os.getenv("TTS_MODEL", "tts-1")
+# Pipeline-Modus: satzweise Synthese, mehrere Segmente gleichzeitig, Auslieferung in Reihenfolge
+TTS_PIPELINE = os.getenv("TTS_PIPELINE", "false").lower() in ("1", "true", "yes")
+TTS_PIPELINE_CONCURRENCY = int(os.getenv("TTS_PIPELINE_CONCURRENCY", "3"))
+TTS_MIN_SEGMENT_CHARS = int(os.getenv("TTS_MIN_SEGMENT_CHARS", "40"))
+# Der Cache ersetzt die zufällig benannten tts_*.wav; alte Dateien werden mit übernommen und verdrängt
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", STATIC_AUDIO_DIR)
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Ein einziger Schreib-Thread: Aufträge laufen in Reihenfolge ab, der Loop wartet nie auf die Platte
+_audio_writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-writer")
+# Cache-Lookups und -Lesezugriffe getrennt davon, damit ein Treffer nie hinter laufenden Schreibvorgängen wartet
+_audio_reader_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("TTS_CACHE_READ_WORKERS", "4")), thread_name_prefix="tts-reader"
+)
+
+class AudioFileWriter:
+    """Schreibt Audio-Chunks im Hintergrund-Thread; write() kehrt sofort zurück."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._error = None
+        self._loop = asyncio.get_running_loop()
+
+    def _write(self, chunk):
+        if self._error is not None:
+            return
+        try:
+            if self._file is None:
+                self._file = open(self.path, "wb")
+            self._file.write(chunk)
+        except OSError as e:
+            self._error = e
+
+    def _close(self, discard):
+        if self._file is not None:
+            self._file.close()
+        if discard or self._error is not None:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+        if self._error is not None:
+            raise self._error
+
+    def write(self, chunk):
+        self._loop.run_in_executor(_audio_writer_executor, self._write, chunk)
+
+    async def close(self, discard=False):
+        """Wartet, bis alle Chunks geschrieben sind; mit discard=True wird die Datei verworfen."""
+        await self._loop.run_in_executor(_audio_writer_executor, self._close, discard)
+
+PCM_SAMPLE_RATE = 24000  # OpenAI liefert pcm als 24 kHz, 16 Bit signed little-endian, mono
+
+class TTSOptions(BaseModel):
+    """Pro Verbindung aushandelbare TTS-Einstellungen (Control-Message auf dem WebSocket)."""
+    format: Literal["wav", "opus", "mp3", "aac", "pcm"] = "wav"
+    chunk_size: int = Field(TTS_CHUNK_SIZE, ge=256, le=65536)
+    pipeline: Optional[bool] = None
+
+    @classmethod
+    def from_message(cls, message):
+        """Control-Message {"type": "config", ...} als TTSOptions, sonst None (normaler Text).
+        Ungültige Werte werfen ValueError."""
+        if not message.lstrip().startswith("{"):
+            return None
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or payload.get("type") != "config":
+            return None
+        payload.pop("type")
+        return cls(**payload)
+
+    def describe(self):
+        """Bestätigung an den Client, bei pcm inkl. Sample-Format."""
+        description = {"type": "config", **self.model_dump()}
+        if self.format == "pcm":
+            description.update(sample_rate=PCM_SAMPLE_RATE, sample_format="s16le", channels=1)
+        return description
+
+DEFAULT_TTS_OPTIONS = TTSOptions()
+
+def tts_cache_key(text, voice, model, response_format):
+    """Inhaltsadresse einer Sprachausgabe: gleicher Text + Stimme + Modell + Format = gleiche Datei."""
+    digest = hashlib.sha256(json.dumps([text, voice, model, response_format]).encode()).hexdigest()
+    return f"{digest}.{response_format}"
+
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?…:;])\s+|\n{2,}")
+
+def split_sentences(text, min_chars=TTS_MIN_SEGMENT_CHARS):
+    """Teilt Text in Sätze; sehr kurze Sätze werden mit dem folgenden zusammengefasst,
+    damit nicht für jedes "Ja." ein eigener API-Aufruf entsteht."""
+    segments = []
+    current = ""
+    for sentence in _SENTENCE_END_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        current = f"{current} {sentence}" if current else sentence
+        if len(current) >= min_chars:
+            segments.append(current)
+            current = ""
+    if current:
+        segments.append(current)
+    return segments
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
 class OpenAiAssistant:
-    def __init__(self, tts_voice="nova", whisper_model="whisper-1"):
-        self.client = OpenAI(api_key=os.getenv("OPEN_AI_API_KEY"))  # OpenAI-Client initialisieren
+    def __init__(self, tts_voice="nova", whisper_model="whisper-1", persist_audio=TTS_PERSIST_AUDIO, cache=None,
+                 pipeline=TTS_PIPELINE, pipeline_concurrency=TTS_PIPELINE_CONCURRENCY):
+        # Erst hier importieren: das openai-Paket braucht beim Laden mehrere hundert Millisekunden
+        from openai import AsyncOpenAI
+
+        self.client = AsyncOpenAI(api_key=os.getenv("OPEN_AI_API_KEY"))  # OpenAI-Client initialisieren
         self.tts_voice = tts_voice
-        self.whisper_model = whisper_model        
+        self.whisper_model = whisper_model
+        self.persist_audio = persist_audio
+        self.cache = cache if cache is not None else DiskLRUCache(TTS_CACHE_DIR, TTS_CACHE_MAX_BYTES)
+        self.pipeline = pipeline
+        self.pipeline_concurrency = pipeline_concurrency
 
-    async def get_whisper_response(self, text, websocket):
+    async def get_whisper_response(self, text, websocket, options=DEFAULT_TTS_OPTIONS):
         """Splittet den Text und sendet ihn Satz für Satz an TTS"""
+        pipeline = self.pipeline if options.pipeline is None else options.pipeline
+        if pipeline:
+            await self.stream_pipelined(split_sentences(text), websocket, options=options)
+            return
+
         splitted_text = text.split("\n\n")
         for text in splitted_text:
-            await self.stream_text_to_speech(text, websocket)
+            await self.stream_text_to_speech(text, websocket, options=options)
+
+    async def stream_pipelined(self, segments, websocket, persist=None, options=DEFAULT_TTS_OPTIONS):
+        """Synthetisiert bis zu `pipeline_concurrency` Segmente gleichzeitig und liefert sie
+        strikt in Reihenfolge aus. Jedes Segment wird von JSON-Markern eingerahmt:
+        {"type": "segment_start", "index": i, "text": ...} ... {"type": "segment_end", "index": i}
+
+        Ein Platz im Semaphor wird erst frei, wenn das Segment ausgeliefert ist; so
+        liegen nie mehr als `pipeline_concurrency` Segmente im Speicher."""
+        slots = asyncio.Semaphore(self.pipeline_concurrency)
+        buffers = [asyncio.Queue() for _ in segments]
+
+        async def produce(index, segment):
+            await slots.acquire()
+            try:
+                await self._synthesize(segment, buffers[index].put, persist, options)
+            except Exception as e:
+                await buffers[index].put(e)
+            finally:
+                await buffers[index].put(None)
 
-    async def stream_text_to_speech(self, text, websocket):
-        """ Wandelt Text in Sprache um, speichert und sendet den Stream parallel """
+        # Tasks in Reihenfolge anlegen: der Semaphor ist fair, Segment 1 startet zuerst
+        producers = [asyncio.create_task(produce(i, segment)) for i, segment in enumerate(segments)]
         try:
-            # Generiere eine eindeutige Datei im Audio-Ordner
-            temp_audio_path = os.path.join(STATIC_AUDIO_DIR, f"tts_{next(tempfile._get_candidate_names())}.wav")
-
-            # Öffne die Datei im Schreibmodus (Binary)
-            with open(temp_audio_path, "wb") as audio_file:
-                # Text-to-Speech-Stream anfordern (chunked response)
-                response = self.client.audio.speech.create(
-                    model="tts-1",
-                    voice=self.tts_voice,
-                    input=text,
-                    response_format="wav"  # WAV-Format für höhere Qualität
-                )
-
-                # Chunks verarbeiten und gleichzeitig speichern + senden
-                for chunk in response.iter_bytes():  
-                    audio_file.write(chunk)  # In Datei speichern
-                    await websocket.send_bytes(chunk)  # Sofort an WebSocket senden
-
-            print(f"✅ Audio gespeichert unter: {temp_audio_path}")
+            for index, segment in enumerate(segments):
+                await websocket.send_text(json.dumps({"type": "segment_start", "index": index, "text": segment}))
+                while True:
+                    item = await buffers[index].get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        print(f"❌ Fehler beim Generieren der Sprachdatei: {item}")
+                        await websocket.send_text(f"Fehler: {str(item)}")
+                        continue
+                    await websocket.send_bytes(item)
+                await websocket.send_text(json.dumps({"type": "segment_end", "index": index}))
+                slots.release()
+        finally:
+            for producer in producers:
+                producer.cancel()
+
+    async def stream_text_to_speech(self, text, websocket, persist=None, options=DEFAULT_TTS_OPTIONS):
+        """ Wandelt Text in Sprache um und sendet jeden Chunk sofort """
+        try:
+            await self._synthesize(text, websocket.send_bytes, persist, options)
+
+        except WebSocketDisconnect:
+            raise
 
         except Exception as e:
             print(f"❌ Fehler beim Generieren der Sprachdatei: {e}")
             await websocket.send_text(f"Fehler: {str(e)}")  # Fehler über WebSocket zurückgeben
+
+    async def _synthesize(self, text, emit, persist=None, options=DEFAULT_TTS_OPTIONS):
+        """ Erzeugt Sprache für `text` im ausgehandelten Format und übergibt jeden Chunk an `emit`.
+        Bereits erzeugte Audios kommen aus dem Cache; neue werden optional im Hintergrund gespeichert """
+        persist = self.persist_audio if persist is None else persist
+        response_format = options.format
+        chunk_size = options.chunk_size
+        key = tts_cache_key(text, self.tts_voice, TTS_MODEL, response_format)
+        loop = asyncio.get_running_loop()
+
+        cached_path = await loop.run_in_executor(_audio_reader_executor, self.cache.get, key)
+        if cached_path is not None:
+            try:
+                audio = await loop.run_in_executor(_audio_reader_executor, _read_file, cached_path)
+            except FileNotFoundError:
+                await loop.run_in_executor(_audio_reader_executor, self.cache.discard, key)
+            else:
+                for start in range(0, len(audio), chunk_size):
+                    await emit(audio[start:start + chunk_size])
+                return
+
+        writer = AudioFileWriter(self.cache.temp_path(key)) if persist else None
+        started = time.perf_counter()
+        first_chunk = True
+        emitting = False
+        try:
+            # Text-to-Speech-Stream anfordern (chunked response)
+            async with self.client.audio.speech.with_streaming_response.create(
+                model=TTS_MODEL,
+                voice=self.tts_voice,
+                input=text,
+                response_format=response_format
+            ) as response:
+                # Chunks sofort weitergeben, Speichern läuft nebenher
+                async for chunk in response.iter_bytes(chunk_size):
+                    if first_chunk:
+                        UPSTREAM_DURATION.observe(time.perf_counter() - started, "openai", "tts_first_chunk", "ok")
+                        first_chunk = False
+                    if writer is not None:
+                        writer.write(chunk)
+                    emitting = True
+                    await emit(chunk)
+                    emitting = False
+        except BaseException as e:
+            # Nur Fehler von OpenAI zählen als Upstream-Fehler; Client weg oder Abbruch nicht
+            if isinstance(e, Exception) and not emitting:
+                UPSTREAM_DURATION.observe(time.perf_counter() - started, "openai", "tts", "error")
+            if writer is not None:
+                try:
+                    await writer.close(discard=True)
+                except OSError:
+                    pass
+            raise
+        UPSTREAM_DURATION.observe(time.perf_counter() - started, "openai", "tts", "ok")
+
+        if writer is not None:
+            try:
+                await writer.close()
+                path = await loop.run_in_executor(_audio_writer_executor, self.cache.commit, key, writer.path)
+                print(f"✅ Audio gespeichert unter: {path}")
+            except OSError as e:
+                print(f"❌ Fehler beim Speichern der Sprachdatei: {e}")
@@ -0,0 +1,137 @@
+import os
+import asyncio
+import weakref
+
+from fastapi import WebSocketDisconnect
+
+from modules.metrics import REGISTRY, Gauge, WEBSOCKET_SLOW_DISCONNECTS
+from modules.serialization import send_frame
+
+WS_AUDIO_QUEUE = int(os.getenv("WS_AUDIO_QUEUE", "64"))  # Audio-Chunks pro Verbindung
+WS_AUDIO_BLOCK_TIMEOUT = float(os.getenv("WS_AUDIO_BLOCK_TIMEOUT", "5"))  # Sekunden, dann Trennung
+WS_CLOSE_FLUSH_TIMEOUT = 1.0  # Sekunden, die close() noch auf ausstehende Frames wartet
+
+CLOSE_TRY_AGAIN_LATER = 1013
+
+_live = weakref.WeakSet()  # alles mit .stream und .depth, für die Queue-Tiefe in /metrics
+
+
+class SlowClientError(WebSocketDisconnect):
+    """Client nimmt zu lange nichts ab; die Verbindung wurde geschlossen."""
+
+    def __init__(self, stream):
+        super().__init__(code=CLOSE_TRY_AGAIN_LATER, reason=f"Client zu langsam ({stream})")
+
+
+def track_queue(queue):
+    """Queue (mit .stream und .depth) in websocket_outbound_queue_depth mitzählen."""
+    _live.add(queue)
+
+
+def untrack_queue(queue):
+    _live.discard(queue)
+
+
+class OutboundQueue:
+    """Begrenzte Sende-Queue mit eigener Task pro WebSocket-Verbindung.
+
+    Der Erzeuger wartet nie auf das Netz, sondern nur auf die Queue. Ist sie
+    voll, wartet er bis `block_timeout` auf Platz, danach wird die Verbindung
+    getrennt (Audio, bei dem keine Lücken entstehen dürfen). Statusdaten
+    laufen stattdessen über broadcast.Subscription ("neuester gewinnt").
+    send_text/send_bytes entsprechen der WebSocket-API, damit bestehender Code
+    die Queue anstelle des Sockets bekommen kann.
+    """
+
+    def __init__(self, websocket, stream, maxsize=WS_AUDIO_QUEUE, block_timeout=WS_AUDIO_BLOCK_TIMEOUT):
+        self.websocket = websocket
+        self.stream = stream
+        self.block_timeout = block_timeout
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._sender = None
+        self._error = None
+        track_queue(self)
+
+    @property
+    def depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        self._sender = asyncio.create_task(self._send_loop(), name=f"ws-send-{self.stream}")
+        return self
+
+    async def _send_loop(self):
+        try:
+            while True:
+                frame = await self._queue.get()
+                try:
+                    await send_frame(self.websocket, frame)
+                finally:
+                    self._queue.task_done()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Client weg oder Socket bereits geschlossen
+            self._error = e if isinstance(e, WebSocketDisconnect) else WebSocketDisconnect(code=1006, reason=str(e))
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
+
+    async def put(self, frame):
+        self._raise_if_failed()
+        if not self._queue.full():
+            self._queue.put_nowait(frame)
+            return
+
+        put = asyncio.ensure_future(self._queue.put(frame))
+        done, _ = await asyncio.wait({put, self._sender}, timeout=self.block_timeout,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if put in done:
+            return
+        put.cancel()
+        self._raise_if_failed()
+        WEBSOCKET_SLOW_DISCONNECTS.inc(self.stream)
+        print(f"WebSocket {self.stream}: Client nimmt seit {self.block_timeout:g} s nichts ab, wird getrennt")
+        self._error = SlowClientError(self.stream)
+        await self._abort()
+        raise self._error
+
+    async def send_text(self, text):
+        await self.put(text)
+
+    async def send_bytes(self, data):
+        await self.put(data)
+
+    async def _abort(self):
+        if self._sender is not None:
+            self._sender.cancel()
+        try:
+            await asyncio.wait_for(self.websocket.close(code=CLOSE_TRY_AGAIN_LATER), WS_CLOSE_FLUSH_TIMEOUT)
+        except Exception:
+            pass
+
+    async def close(self, flush_timeout=WS_CLOSE_FLUSH_TIMEOUT):
+        """Wartet kurz auf ausstehende Frames (z.B. eine Fehlermeldung) und beendet die Sende-Task."""
+        if self._sender is None:
+            return
+        if self._error is None and not self._sender.done():
+            try:
+                await asyncio.wait_for(self._queue.join(), flush_timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._sender.cancel()
+        untrack_queue(self)
+
+
+def _queue_depths():
+    depths = {}
+    for queue in list(_live):
+        depths[queue.stream] = depths.get(queue.stream, 0) + queue.depth
+    return [((stream,), depth) for stream, depth in depths.items()]
+
+
+REGISTRY.register(Gauge(
+    "websocket_outbound_queue_depth", "Ausstehende Frames in den Sende-Queues je Stream", ("stream",),
+    collect=_queue_depths,
+))
@@ -0,0 +1,116 @@
+import os
+import re
+import time
+import heapq
+import psutil
+from datetime import datetime
+
+PROCESS_TOP_N = int(os.getenv("PROCESS_TOP_N", "15"))
+PROCESS_SAMPLE_INTERVAL = float(os.getenv("PROCESS_SAMPLE_INTERVAL", "1"))  # Sekunden, Takt für ?interval=1|5|30
+PROCESS_RESCAN_INTERVAL = float(os.getenv("PROCESS_RESCAN_INTERVAL", "10"))  # Sekunden
+
+# /proc/<pid>/cgroup: .../docker-<id>.scope, /docker/<id>, /kubepods/.../<id>
+_CONTAINER_RE = re.compile(r"(?:docker[-/]|libpod-|crio-|containerd[-/])?([0-9a-f]{64})")
+
+
+def _container_of(pid):
+    """Kurze Container-ID aus der cgroup des Prozesses, sonst None."""
+    try:
+        with open(f"/proc/{pid}/cgroup") as f:
+            match = _CONTAINER_RE.search(f.read())
+    except OSError:
+        return None
+    return match.group(1)[:12] if match else None
+
+
+class _Tracked:
+    __slots__ = ("process", "name", "username", "container")
+
+    def __init__(self, process, name, username, container):
+        self.process = process
+        self.name = name
+        self.username = username
+        self.container = container
+
+
+class ProcessSampler:
+    """Top-N-Prozesstabelle mit wenig Aufwand pro Tick.
+
+    Die psutil.Process-Objekte bleiben zwischen den Ticks erhalten, damit
+    cpu_percent() die Differenz seit dem letzten Tick liefert. Die PID-Liste
+    wird nur alle `rescan_interval` Sekunden neu gelesen; Name, Benutzer und
+    Container werden einmal pro Prozess ermittelt. Geliefert werden nur die
+    Top N nach CPU und RSS sowie Summen pro Benutzer.
+    """
+
+    def __init__(self, top_n=PROCESS_TOP_N, rescan_interval=PROCESS_RESCAN_INTERVAL):
+        self.top_n = top_n
+        self.rescan_interval = rescan_interval
+        self._tracked = {}
+        self._last_rescan = None
+
+    def _rescan(self):
+        pids = set(psutil.pids())
+        for pid in list(self._tracked):
+            # PID verschwunden oder von einem neuen Prozess wiederverwendet
+            if pid not in pids or not self._tracked[pid].process.is_running():
+                del self._tracked[pid]
+        for pid in pids - self._tracked.keys():
+            try:
+                process = psutil.Process(pid)
+                with process.oneshot():
+                    name = process.name()
+                    try:
+                        username = process.username()
+                    except (psutil.AccessDenied, KeyError):
+                        username = None
+                    process.cpu_percent(None)  # Startwert, der erste echte Wert kommt im nächsten Tick
+            except (psutil.NoSuchProcess, psutil.ZombieProcess, psutil.AccessDenied):
+                continue
+            self._tracked[pid] = _Tracked(process, name, username, _container_of(pid))
+
+    def collect(self):
+        now = time.monotonic()
+        if self._last_rescan is None or now - self._last_rescan >= self.rescan_interval:
+            self._rescan()
+            self._last_rescan = now
+
+        rows = []
+        users = {}
+        for pid, tracked in list(self._tracked.items()):
+            process = tracked.process
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_percent(None)
+                    rss = process.memory_info().rss
+                    status = process.status()
+            except (psutil.NoSuchProcess, psutil.ZombieProcess):
+                del self._tracked[pid]
+                continue
+            except psutil.AccessDenied:
+                continue
+
+            rows.append({
+                "pid": pid,
+                "name": tracked.name,
+                "username": tracked.username,
+                "container": tracked.container,
+                "status": status,
+                "cpu_percent": round(cpu, 1),
+                "rss": rss,
+            })
+            user = users.setdefault(tracked.username or "?", {"processes": 0, "cpu_percent": 0.0, "rss": 0})
+            user["processes"] += 1
+            user["cpu_percent"] += cpu
+            user["rss"] += rss
+
+        for user in users.values():
+            user["cpu_percent"] = round(user["cpu_percent"], 1)
+
+        return {
+            "timestamp": datetime.now().timestamp(),
+            "process_count": len(rows),
+            "top_cpu": heapq.nlargest(self.top_n, rows, key=lambda r: r["cpu_percent"]),
+            "top_rss": heapq.nlargest(self.top_n, rows, key=lambda r: r["rss"]),
+            "users": users,
+        }
@@ -2,22 +2,52 @@ from pathlib import Path
 import urllib
 import os
 import subprocess
+import threading
+import time
+from bisect import bisect_left
 from collections import defaultdict
 import json
 
-def find_all_videos(base_path="/mnt/extern/cctv"):
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+RECORDINGS_BASE_PATH = os.getenv("RECORDINGS_BASE_PATH", "/mnt/extern/cctv")
+RECORDINGS_RESYNC_INTERVAL = float(os.getenv("RECORDINGS_RESYNC_INTERVAL", "900"))  # Sekunden
+RECORDINGS_WATCHDOG_INTERVAL = float(os.getenv("RECORDINGS_WATCHDOG_INTERVAL", "10"))  # Sekunden
+RECORDINGS_READY_TIMEOUT = float(os.getenv("RECORDINGS_READY_TIMEOUT", "10"))  # Sekunden, danach 503
+
+VIDEO_SUFFIX = ".mp4"
+
+def _group_key(base: Path, file: Path):
+    """Liefert (Kamera, Tag) für eine Aufnahme relativ zum Basisordner."""
+    parts = file.relative_to(base).parts
+    if len(parts) >= 3:
+        return parts[0], parts[1]
+    # Optional: Gruppiere alles andere unter "_root" oder ähnliches
+    return "_ungrouped", "_root"
+
+def _scan_videos(base: Path):
+    """Schneller rekursiver Scan mit os.scandir (statt Path.rglob)."""
+    stack = [str(base)]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.endswith(VIDEO_SUFFIX):
+                        yield Path(entry.path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            continue
+
+def find_all_videos(base_path=RECORDINGS_BASE_PATH):
     base = Path(base_path)
     grouped_videos = defaultdict(lambda: defaultdict(list))
 
-    for file in base.rglob("*.mp4"):
-        parts = file.relative_to(base).parts
-        if len(parts) >= 3:
-            hauptordner = parts[0]
-            unterordner = parts[1]
-            grouped_videos[hauptordner][unterordner].append(str(file))
-        else:
-            # Optional: Gruppiere alles andere unter "_root" oder ähnliches
-            grouped_videos["_ungrouped"]["_root"].append(str(file))
+    for file in _scan_videos(base):
+        hauptordner, unterordner = _group_key(base, file)
+        grouped_videos[hauptordner][unterordner].append(str(file))
 
     # defaultdicts in normale dicts umwandeln, damit json.dump funktioniert
     grouped_videos = {
@@ -27,8 +57,325 @@ def find_all_videos(base_path="/mnt/extern/cctv"):
     return grouped_videos
 
 def get_thumbnail_path(video_path: str):
-    replace_thumbnail_path = video_path.split("/")[-1].split("_")[0]    
+    replace_thumbnail_path = video_path.split("/")[-1].split("_")[0]
     replace_day_path = video_path.split("/")[-2]
     thumbnail_path = video_path.replace(replace_thumbnail_path, "thumbnails", 1).replace(replace_day_path, "", 1).replace(".mp4", "_thumb.jpg")
-    
+
     return thumbnail_path
+
+
+class _IndexEventHandler(FileSystemEventHandler):
+    """Leitet watchdog-Events an den RecordingsIndex weiter."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def on_created(self, event):
+        if event.is_directory:
+            self.index.add_tree(event.src_path)
+        else:
+            self.index.add(event.src_path)
+
+    def on_deleted(self, event):
+        if event.is_directory:
+            self.index.remove_tree(event.src_path)
+        else:
+            self.index.remove(event.src_path)
+
+    def on_closed(self, event):
+        # Aufnahme fertig geschrieben (inotify IN_CLOSE_WRITE)
+        if not event.is_directory:
+            self.index.touch(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            self.index.remove_tree(event.src_path)
+            self.index.add_tree(event.dest_path)
+        else:
+            self.index.remove(event.src_path)
+            self.index.add(event.dest_path)
+
+
+class RecordingsIndex:
+    """In-Memory-Index Kamera -> Tag -> Dateien, aktuell gehalten über watchdog.
+
+    Der Index wird einmal beim Start aufgebaut und danach nur noch über
+    Dateisystem-Events gepflegt. Ein Überwachungs-Thread erkennt einen
+    abgestürzten Observer oder ein neu eingehängtes Laufwerk und baut den
+    Index dann neu auf; zusätzlich gleicht ein periodischer Resync verpasste
+    Events ab.
+    """
+
+    def __init__(self, base_path=RECORDINGS_BASE_PATH, resync_interval=RECORDINGS_RESYNC_INTERVAL,
+                 watchdog_interval=RECORDINGS_WATCHDOG_INTERVAL):
+        self.base = Path(base_path)
+        self.resync_interval = resync_interval
+        self.watchdog_interval = watchdog_interval
+        self._tree = {}
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()  # Abgleich beim Start und Resync nicht parallel
+        self._listeners = []
+        self._observer = None
+        self._mount_signature = None
+        self._stop = threading.Event()
+        self._supervisor = None
+        self._journal = None  # Pfade mit Events während eines laufenden Scans
+        self.ready = threading.Event()
+        self.last_rebuild = None
+
+    # ---- Listener -------------------------------------------------------
+
+    def add_listener(self, callback):
+        """callback(event, path) mit event in {"added", "modified", "removed"}; läuft im watchdog-Thread."""
+        self._listeners.append(callback)
+
+    def _notify(self, event, path):
+        for callback in self._listeners:
+            try:
+                callback(event, path)
+            except Exception as e:
+                print(f"Fehler im Recordings-Listener: {e}")
+
+    # ---- Lebenszyklus ---------------------------------------------------
+
+    def start(self, seed=None):
+        """Baut den Index auf und startet Observer + Überwachung (blockierend, im Thread aufrufen).
+
+        Mit `seed` (bekannte Pfade, z.B. aus dem persistierten Katalog) ist der
+        Index sofort abfragebereit; der Abgleich mit der Platte läuft danach
+        einmal im Hintergrund, Events währenddessen gehen nicht verloren.
+        """
+        try:
+            if seed:
+                with self._lock:
+                    for path in seed:
+                        self._insert(path)
+            else:
+                self.rebuild()
+        finally:
+            self.ready.set()
+        self._start_observer()
+        if seed:
+            threading.Thread(target=self._reconcile, name="recordings-reconcile", daemon=True).start()
+        self._supervisor = threading.Thread(target=self._supervise, name="recordings-index", daemon=True)
+        self._supervisor.start()
+
+    def _reconcile(self):
+        try:
+            self.rebuild()
+        except Exception as e:
+            print(f"Fehler beim Abgleich des Index: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self._stop_observer()
+
+    def _start_observer(self):
+        self._stop_observer()
+        self._mount_signature = self._current_mount_signature()
+        if self._mount_signature is None:
+            print(f"Aufnahmeordner nicht gefunden: {self.base}")
+            return
+        observer = Observer()
+        observer.schedule(_IndexEventHandler(self), str(self.base), recursive=True)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+
+    def _stop_observer(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+
+    def _current_mount_signature(self):
+        try:
+            st = os.stat(self.base)
+        except OSError:
+            return None
+        return st.st_dev, st.st_ino
+
+    def _supervise(self):
+        next_resync = time.monotonic() + self.resync_interval
+        while not self._stop.wait(self.watchdog_interval):
+            signature = self._current_mount_signature()
+            observer_dead = signature is not None and (self._observer is None or not self._observer.is_alive())
+            if signature != self._mount_signature or observer_dead:
+                # Laufwerk neu eingehängt, entfernt oder Observer ausgefallen
+                print("Aufnahmeordner verändert, Index wird neu aufgebaut")
+                try:
+                    self._start_observer()
+                    self.rebuild()
+                except Exception as e:
+                    print(f"Fehler beim Neuaufbau des Index: {e}")
+                next_resync = time.monotonic() + self.resync_interval
+            elif time.monotonic() >= next_resync:
+                try:
+                    self.rebuild()
+                except Exception as e:
+                    print(f"Fehler beim Resync des Index: {e}")
+                next_resync = time.monotonic() + self.resync_interval
+
+    # ---- Pflege ---------------------------------------------------------
+
+    def rebuild(self):
+        """Vollständiger Scan; ersetzt den Baum atomar und meldet Unterschiede an die Listener.
+
+        Events, die während des Scans eintreffen, werden vorgemerkt und nach
+        dem Scan mit dem aktuellen Stand der Datei übernommen. Fehlt der
+        Basisordner oder findet der Scan gar nichts, obwohl der Index Dateien
+        kennt (Laufwerk nicht eingehängt), bleibt der Index unverändert.
+        """
+        with self._rebuild_lock:
+            self._rebuild()
+
+    def _rebuild(self):
+        if self._current_mount_signature() is None:
+            print(f"Aufnahmeordner nicht gefunden: {self.base}, Index bleibt unverändert")
+            return
+        with self._lock:
+            self._journal = set()
+        try:
+            new_paths = {str(file) for file in _scan_videos(self.base)}
+        except BaseException:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            old_paths = set(self._iter_paths(self._tree))
+            if old_paths and not new_paths:
+                print(f"Aufnahmeordner {self.base} ist leer, Index bleibt unverändert")
+                return
+            # Während des Scans geänderte Pfade nach aktuellem Stand übernehmen
+            for path in journal:
+                if os.path.isfile(path):
+                    new_paths.add(path)
+                else:
+                    new_paths.discard(path)
+            # Nur melden, was wirklich weg ist (der Scan kann Dateien verpassen)
+            for path in old_paths - new_paths:
+                if os.path.isfile(path):
+                    new_paths.add(path)
+            self._tree = self._build_tree(new_paths)
+            self.last_rebuild = time.time()
+
+        for path in new_paths - old_paths:
+            self._notify("added", path)
+        for path in old_paths - new_paths:
+            self._notify("removed", path)
+        self.ready.set()
+
+    def _build_tree(self, paths):
+        tree = defaultdict(lambda: defaultdict(list))
+        for path in paths:
+            key = self._key_for(path)
+            if key is not None:
+                tree[key[0]][key[1]].append(path)
+        for days in tree.values():
+            for files in days.values():
+                files.sort()
+        return {k: dict(v) for k, v in tree.items()}
+
+    def _remember(self, path):
+        # Mit gehaltenem _lock aufrufen; nur während eines rebuild() aktiv
+        if self._journal is not None:
+            self._journal.add(path)
+
+    @staticmethod
+    def _iter_paths(tree):
+        for days in tree.values():
+            for files in days.values():
+                yield from files
+
+    def _key_for(self, path):
+        file = Path(path)
+        try:
+            return _group_key(self.base, file)
+        except ValueError:
+            return None
+
+    def _insert(self, path):
+        key = self._key_for(path)
+        if key is None:
+            return False
+        files = self._tree.setdefault(key[0], {}).setdefault(key[1], [])
+        i = bisect_left(files, path)
+        if i < len(files) and files[i] == path:
+            return False
+        files.insert(i, path)
+        return True
+
+    def add(self, path):
+        if not path.endswith(VIDEO_SUFFIX):
+            return
+        with self._lock:
+            self._remember(path)
+            added = self._insert(path)
+        if added:
+            self._notify("added", path)
+
+    def touch(self, path):
+        if not path.endswith(VIDEO_SUFFIX):
+            return
+        with self._lock:
+            self._remember(path)
+            added = self._insert(path)
+        self._notify("added" if added else "modified", path)
+
+    def remove(self, path):
+        key = self._key_for(path)
+        if key is None:
+            return
+        with self._lock:
+            self._remember(path)
+            days = self._tree.get(key[0], {})
+            files = days.get(key[1], [])
+            i = bisect_left(files, path)
+            if i >= len(files) or files[i] != path:
+                return
+            del files[i]
+            if not files:
+                del days[key[1]]
+            if not days:
+                self._tree.pop(key[0], None)
+        self._notify("removed", path)
+
+    def add_tree(self, directory):
+        for file in _scan_videos(Path(directory)):
+            self.add(str(file))
+
+    def remove_tree(self, directory):
+        prefix = directory.rstrip(os.sep) + os.sep
+        with self._lock:
+            paths = [p for p in self._iter_paths(self._tree) if p.startswith(prefix)]
+        for path in paths:
+            self.remove(path)
+
+    # ---- Abfragen -------------------------------------------------------
+
+    def snapshot(self, camera=None, day=None):
+        """Kopie des (gefilterten) Baums im Format von find_all_videos."""
+        with self._lock:
+            if camera is not None:
+                cameras = {camera: self._tree[camera]} if camera in self._tree else {}
+            else:
+                cameras = self._tree
+            result = {}
+            for cam, days in cameras.items():
+                if day is not None:
+                    if day in days:
+                        result[cam] = {day: list(days[day])}
+                else:
+                    result[cam] = {d: list(files) for d, files in days.items()}
+            return result
+
+    def contains(self, path):
+        key = self._key_for(path)
+        if key is None:
+            return False
+        with self._lock:
+            files = self._tree.get(key[0], {}).get(key[1], [])
+            i = bisect_left(files, path)
+            return i < len(files) and files[i] == path
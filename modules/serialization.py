@@ -0,0 +1,47 @@
+import json
+
+from fastapi.responses import JSONResponse
+
+# Beide Bibliotheken sind optional: ohne orjson greift die Standardbibliothek,
+# ohne msgpack gibt es nur JSON-Frames
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+else:
+    FastJSONResponse = JSONResponse
+
+
+def available_encodings():
+    return ("json", "msgpack") if msgpack is not None else ("json",)
+
+
+def check_encoding(encoding):
+    """Wirft ValueError für nicht unterstützte Frame-Kodierungen."""
+    if encoding not in available_encodings():
+        raise ValueError(f"Kodierung muss eine von {available_encodings()} sein")
+    return encoding
+
+
+def encode(obj, encoding="json"):
+    """JSON als str (Text-Frame) oder msgpack als bytes (Binär-Frame)."""
+    if encoding == "msgpack":
+        return msgpack.packb(obj, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+
+async def send_frame(websocket, frame):
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
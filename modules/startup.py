@@ -0,0 +1,121 @@
+import os
+import sys
+import time
+import asyncio
+import builtins
+import threading
+
+import psutil
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Mit DEBUG werden Importzeiten mitgeschrieben und nach dem Start als Bericht ausgegeben
+STARTUP_DEBUG = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+STARTUP_REPORT_TOP = int(os.getenv("STARTUP_REPORT_TOP", "15"))
+
+_phases = []  # (name, sekunden)
+_phase_started = time.perf_counter()
+
+
+class ImportTimer:
+    """Misst wie `python -X importtime` die kumulierte Zeit jedes erstmaligen Imports.
+
+    Hängt sich in builtins.__import__ ein; bereits geladene Module und
+    relative Importe laufen ohne Messung durch."""
+
+    def __init__(self):
+        self.timings = []  # (tiefe, modul, sekunden) in Abschlussreihenfolge
+        self._original = None
+        self._local = threading.local()
+
+    def install(self):
+        if self._original is None:
+            self._original = builtins.__import__
+            builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original is not None:
+            builtins.__import__ = self._original
+            self._original = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original or builtins.__import__
+        if level or name in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            self._local.depth = depth
+            self.timings.append((depth, name, time.perf_counter() - started))
+
+    def slowest(self, limit):
+        return sorted(self.timings, key=lambda t: t[2], reverse=True)[:limit]
+
+
+import_timer = ImportTimer()
+
+
+def track_imports():
+    """Ganz oben in main.py aufrufen; ohne DEBUG passiert nichts."""
+    if STARTUP_DEBUG:
+        import_timer.install()
+
+
+def mark(phase):
+    """Schließt eine Startphase ab (Dauer seit der vorigen Marke)."""
+    global _phase_started
+    now = time.perf_counter()
+    _phases.append((phase, now - _phase_started))
+    _phase_started = now
+
+
+def report():
+    """Startbericht: Phasen, Zeit seit Prozessstart und die langsamsten Importe (nur mit DEBUG)."""
+    import_timer.uninstall()
+    if not STARTUP_DEBUG:
+        return
+    since_process_start = time.time() - psutil.Process().create_time()
+    print(f"Start nach {since_process_start * 1000:.0f} ms seit Prozessstart")
+    for phase, seconds in _phases:
+        print(f"  Phase {phase}: {seconds * 1000:.1f} ms")
+    if import_timer.timings:
+        print(f"  Langsamste Importe (kumuliert, Top {STARTUP_REPORT_TOP}):")
+        for depth, name, seconds in import_timer.slowest(STARTUP_REPORT_TOP):
+            print(f"    {seconds * 1000:8.1f} ms  {'  ' * depth}{name}")
+
+
+class LazyService:
+    """Erzeugt ein Subsystem erst bei der ersten Nutzung, samt seiner schweren Importe.
+
+    `factory` läuft genau einmal; aus dem Event-Loop heraus über aget(), damit
+    der Import (openai, aiortc, ...) den Loop nicht blockiert. `instance` ist
+    None, solange niemand den Dienst gebraucht hat."""
+
+    def __init__(self, name, factory):
+        self.name = name
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    @property
+    def instance(self):
+        return self._instance
+
+    def get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    started = time.perf_counter()
+                    self._instance = self._factory()
+                    if STARTUP_DEBUG:
+                        print(f"{self.name} initialisiert in {(time.perf_counter() - started) * 1000:.1f} ms")
+        return self._instance
+
+    async def aget(self):
+        if self._instance is not None:
+            return self._instance
+        return await asyncio.to_thread(self.get)
@@ -0,0 +1,225 @@
+import os
+import json
+import asyncio
+import math
+import time
+import threading
+from array import array
+
+STATS_HISTORY_PATH = os.getenv("STATS_HISTORY_PATH", "")  # leer: kein Snapshot auf Platte
+STATS_HISTORY_SNAPSHOT_INTERVAL = float(os.getenv("STATS_HISTORY_SNAPSHOT_INTERVAL", "300"))  # Sekunden
+
+# (Schrittweite in Sekunden, Anzahl Slots): 1s für 1h, 1min für 1 Tag, 15min für 30 Tage
+HISTORY_TIERS = ((1, 3600), (60, 1440), (900, 2880))
+
+_NAN = float("nan")
+_SNAPSHOT_VERSION = 1
+
+
+def extract_metrics(sample, previous=None):
+    """Flache Kennzahlen {name: wert} aus einem Sample von SystemStatsCollector.
+
+    Zähler (Disk-IO) werden mit `previous` (dem vorherigen Sample) zu Raten pro
+    Sekunde; ohne Vorgänger fehlen sie."""
+    metrics = {}
+    cpu = sample.get("cpu") or {}
+    if cpu.get("percent") is not None:
+        metrics["cpu.percent"] = cpu["percent"]
+    for core, percent in enumerate(cpu.get("percent_per_core") or ()):
+        metrics[f"cpu.core.{core}"] = percent
+    for name, value in zip(("1", "5", "15"), cpu.get("load_avg") or ()):
+        metrics[f"load.{name}"] = value
+
+    for section in ("memory", "swap"):
+        values = sample.get(section) or {}
+        for key in ("percent", "used"):
+            if values.get(key) is not None:
+                metrics[f"{section}.{key}"] = values[key]
+
+    io = (sample.get("disk") or {}).get("io")
+    previous_io = ((previous or {}).get("disk") or {}).get("io")
+    elapsed = sample.get("timestamp", 0) - (previous or {}).get("timestamp", 0)
+    if io and previous_io and elapsed > 0:
+        for key in ("read_bytes", "write_bytes", "read_count", "write_count"):
+            if key in io and key in previous_io:
+                metrics[f"disk.{key}_per_s"] = max(0, io[key] - previous_io[key]) / elapsed
+
+    for chip, sensors in (sample.get("temperatures") or {}).items():
+        for index, sensor in enumerate(sensors):
+            label = sensor.get("label") or str(index)
+            if sensor.get("current") is not None:
+                metrics[f"temp.{chip}.{label}"] = sensor["current"]
+    return metrics
+
+
+class _Tier:
+    """Ringpuffer einer Auflösung: pro Kennzahl ein array('d'), Slot = (ts // step) % size.
+
+    Gröbere Stufen mitteln alle Werte eines Slots (laufender Mittelwert)."""
+
+    def __init__(self, step, size):
+        self.step = step
+        self.size = size
+        self.buckets = array("q", [-1]) * size  # welcher Zeit-Bucket gerade im Slot liegt
+        self.values = {}
+        self.counts = {}
+
+    def _series(self, name):
+        values = self.values.get(name)
+        if values is None:
+            values = self.values[name] = array("d", [_NAN]) * self.size
+            self.counts[name] = array("I", [0]) * self.size
+        return values, self.counts[name]
+
+    def record(self, ts, metrics):
+        bucket = int(ts // self.step)
+        slot = bucket % self.size
+        if self.buckets[slot] != bucket:
+            # Slot gehört zu einer älteren Runde: für alle Kennzahlen leeren
+            self.buckets[slot] = bucket
+            for name, values in self.values.items():
+                values[slot] = _NAN
+                self.counts[name][slot] = 0
+        for name, value in metrics.items():
+            values, counts = self._series(name)
+            count = counts[slot] + 1
+            counts[slot] = count
+            values[slot] = value if count == 1 else values[slot] + (value - values[slot]) / count
+
+    def covers(self, start, now):
+        return now - start <= self.step * self.size
+
+    def read(self, names, start, end):
+        first, last = int(start // self.step), int(end // self.step)
+        first = max(first, last - self.size + 1)
+        columns = {}
+        for name in names:
+            values = self.values.get(name)
+            column = []
+            for bucket in range(first, last + 1):
+                slot = bucket % self.size
+                value = values[slot] if values is not None and self.buckets[slot] == bucket else _NAN
+                column.append(None if math.isnan(value) else round(value, 3))
+            columns[name] = column
+        return first * self.step, columns
+
+
+class StatsHistory:
+    """Speicher-Historie der Systemstatistiken in festen Ringpuffern.
+
+    Wird als Listener am SnapshotBroadcaster betrieben und schreibt jeden
+    Sample in alle Stufen (HISTORY_TIERS). Abfragen liefern spaltenweise:
+    {"start": t0, "step": s, "metrics": {name: [wert|null, ...]}} mit Wert i
+    für den Zeitpunkt t0 + i * s. Optional wird regelmäßig ein Snapshot auf
+    die Platte geschrieben und beim Start wieder geladen.
+    """
+
+    def __init__(self, tiers=HISTORY_TIERS, path=STATS_HISTORY_PATH):
+        self.tiers = [_Tier(step, size) for step, size in tiers]
+        self.path = path
+        self._previous = None
+        self._lock = threading.Lock()
+        self._task = None
+
+    def on_sample(self, sample):
+        """Listener für SnapshotBroadcaster.add_listener."""
+        ts = sample.get("timestamp") or time.time()
+        metrics = extract_metrics(sample, self._previous)
+        self._previous = sample
+        with self._lock:
+            for tier in self.tiers:
+                tier.record(ts, metrics)
+
+    def query(self, metrics=None, start=None, end=None, step=None):
+        """Kennzahlen (Namen oder Präfixe wie "cpu.core") im Zeitraum [start, end].
+
+        Gewählt wird die feinste Stufe, die den Zeitraum noch abdeckt und
+        mindestens `step` Sekunden auflöst."""
+        now = time.time()
+        end = min(end or now, now)
+        start = start if start is not None else end - 3600
+        if start > end:
+            raise ValueError("start muss vor end liegen")
+        tier = next(
+            (t for t in self.tiers if t.covers(start, now) and t.step >= (step or 0)),
+            self.tiers[-1],
+        )
+        with self._lock:
+            names = sorted(tier.values.keys())
+            if metrics:
+                names = [n for n in names if any(n == m or n.startswith(m + ".") for m in metrics)]
+            t0, columns = tier.read(names, start, end)
+        return {"start": t0, "step": tier.step, "metrics": columns}
+
+    # ---- Snapshot -------------------------------------------------------
+
+    def start(self, interval=STATS_HISTORY_SNAPSHOT_INTERVAL):
+        if self.path:
+            self._task = asyncio.create_task(self._snapshot_loop(interval), name="stats-history")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            await asyncio.to_thread(self.save)
+
+    async def _snapshot_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.save)
+            except OSError as e:
+                print(f"Fehler beim Speichern der Statistik-Historie: {e}")
+
+    def save(self):
+        """Alle Stufen binär speichern: eine JSON-Kopfzeile, dann die Arrays hintereinander."""
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".part"
+        # unter dem Lock nur kopieren, geschrieben wird ohne den Sampler aufzuhalten
+        with self._lock:
+            header = {
+                "version": _SNAPSHOT_VERSION,
+                "tiers": [{"step": t.step, "size": t.size, "metrics": list(t.values)} for t in self.tiers],
+            }
+            chunks = [json.dumps(header).encode() + b"\n"]
+            for tier in self.tiers:
+                chunks.append(tier.buckets.tobytes())
+                for name in tier.values:
+                    chunks.append(tier.values[name].tobytes())
+                    chunks.append(tier.counts[name].tobytes())
+        with open(temp_path, "wb") as f:
+            f.writelines(chunks)
+        os.replace(temp_path, self.path)
+
+    def load(self):
+        """Snapshot laden; Stufen mit anderer Schrittweite/Größe werden übersprungen."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        with open(self.path, "rb") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != _SNAPSHOT_VERSION:
+                return False
+            loaded = {}
+            for spec in header["tiers"]:
+                size = spec["size"]
+                buckets = array("q")
+                buckets.fromfile(f, size)
+                series = {}
+                for name in spec["metrics"]:
+                    values, counts = array("d"), array("I")
+                    values.fromfile(f, size)
+                    counts.fromfile(f, size)
+                    series[name] = (values, counts)
+                loaded[(spec["step"], size)] = (buckets, series)
+
+        with self._lock:
+            for tier in self.tiers:
+                data = loaded.get((tier.step, tier.size))
+                if data is None:
+                    continue
+                tier.buckets = data[0]
+                tier.values = {name: values for name, (values, _) in data[1].items()}
+                tier.counts = {name: counts for name, (_, counts) in data[1].items()}
+        return True
@@ -1,110 +1,181 @@
+import os
+import time
 import psutil
 import json
 import platform
 from datetime import datetime
 
-def get_system_data():
-    """Sammelt eine Vielzahl von Systemstatistiken, geeignet für Monitoring und Live-Streaming."""
-    data = {}
-
-    data["timestamp"] = datetime.now().timestamp()
-
-    ## Systeminformationen
-    data["system_info"] = {
-        "system": platform.system(),
-        "node": platform.node(),
-        "release": platform.release(),
-        "version": platform.version(),
-        "machine": platform.machine(),
-        "processor": platform.processor()
-    }
-
-    ## Systemzeit / Boot
-    data["boot_time"] = datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S")
-
-    # CPU
-    data["cpu"] = {
-        "percent": psutil.cpu_percent(interval=0),
-        "percent_per_core": psutil.cpu_percent(interval=0, percpu=True),
+# Intervalle (Sekunden) für teure Abfragen, per Umgebungsvariable anpassbar
+STATS_CONNECTIONS_INTERVAL = float(os.getenv("STATS_CONNECTIONS_INTERVAL", "10"))
+STATS_TEMPERATURES_INTERVAL = float(os.getenv("STATS_TEMPERATURES_INTERVAL", "5"))
+STATS_PARTITIONS_INTERVAL = float(os.getenv("STATS_PARTITIONS_INTERVAL", "60"))
+
+MAX_CONNECTIONS = 20  # nur die ersten 20, um es übersichtlich zu halten
+
+def _collect_static():
+    """Werte, die sich zur Laufzeit nicht ändern – einmalig beim Start."""
+    return {
+        "system_info": {
+            "system": platform.system(),
+            "node": platform.node(),
+            "release": platform.release(),
+            "version": platform.version(),
+            "machine": platform.machine(),
+            "processor": platform.processor()
+        },
+        "boot_time": datetime.fromtimestamp(psutil.boot_time()).strftime("%Y-%m-%d %H:%M:%S"),
         "count_logical": psutil.cpu_count(logical=True),
         "count_physical": psutil.cpu_count(logical=False),
-        "freq": psutil.cpu_freq()._asdict() if psutil.cpu_freq() else None,
-        "times": psutil.cpu_times()._asdict(),
-        "stats": psutil.cpu_stats()._asdict(),
-        "load_avg": psutil.getloadavg() if hasattr(psutil, "getloadavg") else None,
-    }
-
-    ## RAM
-    virtual_mem = psutil.virtual_memory()
-    data["memory"] = virtual_mem._asdict()
-
-    ## Swap
-    swap = psutil.swap_memory()
-    data["swap"] = swap._asdict()
-
-    ## Disk
-    data["disk"] = {
-        "usage": psutil.disk_usage("/")._asdict(),
-        "io": psutil.disk_io_counters()._asdict(),
-        "partitions": [
-            {
-                "device": p.device,
-                "mountpoint": p.mountpoint,
-                "fstype": p.fstype,
-                "opts": p.opts,
-            } for p in psutil.disk_partitions()
-        ]
     }
 
-    ## Netzwerk
-    # net_io = psutil.net_io_counters(pernic=True)
-    # data["network_io"] = {
-    #     iface: counters._asdict() for iface, counters in net_io.items()
-    # }
-
-    ## Netzverbindungen
+def _collect_partitions():
+    return [
+        {
+            "device": p.device,
+            "mountpoint": p.mountpoint,
+            "fstype": p.fstype,
+            "opts": p.opts,
+        } for p in psutil.disk_partitions()
+    ]
+
+def _collect_connections():
     try:
         connections = psutil.net_connections()
-        data["network_connections"] = [
-            {
-                "fd": c.fd,
-                "family": str(c.family),
-                "type": str(c.type),
-                "laddr": f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else None,
-                "raddr": f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else None,
-                "status": c.status,
-                "pid": c.pid,
-            } for c in connections[:20]  # nur die ersten 20, um es übersichtlich zu halten
-        ]
     except Exception:
-        data["network_connections"] = []
-
-    ## Prozesse (nur die wichtigsten Infos)
-    # data["processes"] = []
-    # for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent', 'memory_percent']):
-    #     try:
-    #         data["processes"].append(proc.info)
-    #     except (psutil.NoSuchProcess, psutil.AccessDenied):
-    #         continue
-
-    ## Benutzer
-    # data["users"] = [u._asdict() for u in psutil.users()]
-
-    ## Temperaturen (nur wenn unterstützt)
+        return []
+    # psutil liefert immer die komplette Liste, umgewandelt werden nur die ersten
+    return [
+        {
+            "fd": c.fd,
+            "family": str(c.family),
+            "type": str(c.type),
+            "laddr": f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else None,
+            "raddr": f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else None,
+            "status": c.status,
+            "pid": c.pid,
+        } for c in connections[:MAX_CONNECTIONS]
+    ]
+
+def _collect_temperatures():
     try:
         temps = psutil.sensors_temperatures()
-        data["temperatures"] = {k: [t._asdict() for t in v] for k, v in temps.items()}
+        return {k: [t._asdict() for t in v] for k, v in temps.items()}
     except Exception:
-        data["temperatures"] = {}
-
-    ## Lüfter (nur wenn unterstützt)
-    # try:
-    #     fans = psutil.sensors_fans()
-    #     data["fans"] = {k: [f._asdict() for f in v] for k, v in fans.items()}
-    # except Exception:
-    #     data["fans"] = {}
+        return {}
+
+class _Probe:
+    """Teure Abfrage, die nur alle `interval` Sekunden neu ausgeführt wird."""
+
+    def __init__(self, collect, interval):
+        self.collect = collect
+        self.interval = interval
+        self.value = None
+        self.last = None
+
+    def get(self, now):
+        if self.last is None or now - self.last >= self.interval:
+            self.value = self.collect()
+            self.last = now
+        return self.value
+
+class SystemStatsCollector:
+    """Sammelt Systemstatistiken in drei Stufen.
+
+    Statische Infos werden einmal beim Erzeugen gelesen, günstige Zähler bei
+    jedem Aufruf und teure Abfragen (Verbindungen, Temperaturen, Partitionen)
+    nur in ihren eigenen Intervallen. Das Ergebnis hat dasselbe Format wie
+    bisher `get_system_data()`.
+    """
+
+    def __init__(self, connections_interval=STATS_CONNECTIONS_INTERVAL,
+                 temperatures_interval=STATS_TEMPERATURES_INTERVAL,
+                 partitions_interval=STATS_PARTITIONS_INTERVAL):
+        self.static = _collect_static()
+        self.connections = _Probe(_collect_connections, connections_interval)
+        self.temperatures = _Probe(_collect_temperatures, temperatures_interval)
+        self.partitions = _Probe(_collect_partitions, partitions_interval)
+
+    def collect(self):
+        """Sammelt eine Vielzahl von Systemstatistiken, geeignet für Monitoring und Live-Streaming."""
+        now = time.monotonic()
+        data = {}
+
+        data["timestamp"] = datetime.now().timestamp()
+
+        ## Systeminformationen
+        data["system_info"] = self.static["system_info"]
+
+        ## Systemzeit / Boot
+        data["boot_time"] = self.static["boot_time"]
+
+        # CPU
+        freq = psutil.cpu_freq()
+        data["cpu"] = {
+            "percent": psutil.cpu_percent(interval=0),
+            "percent_per_core": psutil.cpu_percent(interval=0, percpu=True),
+            "count_logical": self.static["count_logical"],
+            "count_physical": self.static["count_physical"],
+            "freq": freq._asdict() if freq else None,
+            "times": psutil.cpu_times()._asdict(),
+            "stats": psutil.cpu_stats()._asdict(),
+            "load_avg": psutil.getloadavg() if hasattr(psutil, "getloadavg") else None,
+        }
+
+        ## RAM
+        virtual_mem = psutil.virtual_memory()
+        data["memory"] = virtual_mem._asdict()
+
+        ## Swap
+        swap = psutil.swap_memory()
+        data["swap"] = swap._asdict()
+
+        ## Disk
+        data["disk"] = {
+            "usage": psutil.disk_usage("/")._asdict(),
+            "io": psutil.disk_io_counters()._asdict(),
+            "partitions": self.partitions.get(now),
+        }
+
+        ## Netzwerk
+        # net_io = psutil.net_io_counters(pernic=True)
+        # data["network_io"] = {
+        #     iface: counters._asdict() for iface, counters in net_io.items()
+        # }
+
+        ## Netzverbindungen
+        data["network_connections"] = self.connections.get(now)
+
+        ## Prozesse (nur die wichtigsten Infos)
+        # data["processes"] = []
+        # for proc in psutil.process_iter(['pid', 'name', 'status', 'cpu_percent', 'memory_percent']):
+        #     try:
+        #         data["processes"].append(proc.info)
+        #     except (psutil.NoSuchProcess, psutil.AccessDenied):
+        #         continue
+
+        ## Benutzer
+        # data["users"] = [u._asdict() for u in psutil.users()]
+
+        ## Temperaturen (nur wenn unterstützt)
+        data["temperatures"] = self.temperatures.get(now)
+
+        ## Lüfter (nur wenn unterstützt)
+        # try:
+        #     fans = psutil.sensors_fans()
+        #     data["fans"] = {k: [f._asdict() for f in v] for k, v in fans.items()}
+        # except Exception:
+        #     data["fans"] = {}
+
+        return data
+
+_collector = None
 
-    return data
+def get_system_data():
+    """Kompatibler Einstieg: nutzt einen gemeinsamen SystemStatsCollector."""
+    global _collector
+    if _collector is None:
+        _collector = SystemStatsCollector()
+    return _collector.collect()
 
 # Beispiel für schöne Ausgabe
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import os
+import time
+import asyncio
+import hashlib
+import multiprocessing
+from fractions import Fraction
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.disk_cache import DiskLRUCache
+from modules.offload import OffloadRejected, OffloadTimeout
+from modules.recordings import get_thumbnail_path
+
+THUMBNAIL_CACHE_DIR = os.getenv("THUMBNAIL_CACHE_DIR", "data/thumbnails")
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv("THUMBNAIL_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+THUMBNAIL_WIDTH = int(os.getenv("THUMBNAIL_WIDTH", "320"))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+THUMBNAIL_WARMUP_MAX_AGE = float(os.getenv("THUMBNAIL_WARMUP_MAX_AGE", str(24 * 3600)))  # Sekunden
+THUMBNAIL_WARMUP_QUEUE = 1000
+
+
+def extract_thumbnail(video_path, out_path, width=THUMBNAIL_WIDTH):
+    """Erstes Keyframe dekodieren und als JPEG speichern (läuft im Worker-Prozess)."""
+    import av
+
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = "NONKEY"
+        frame = next(container.decode(stream), None)
+        if frame is None:
+            raise ValueError(f"Kein Bild in {video_path}")
+
+    height = max(2, round(frame.height * width / frame.width / 2) * 2)
+    frame = frame.reformat(width=width, height=height, format="yuvj420p")
+
+    # JPEG direkt mit dem mjpeg-Encoder von PyAV erzeugen (kein Pillow nötig)
+    encoder = av.CodecContext.create("mjpeg", "w")
+    encoder.width = width
+    encoder.height = height
+    encoder.pix_fmt = "yuvj420p"
+    encoder.time_base = Fraction(1, 25)
+    packets = list(encoder.encode(frame)) + list(encoder.encode(None))
+
+    with open(out_path, "wb") as f:
+        for packet in packets:
+            f.write(bytes(packet))
+
+
+def _cache_key(video_path, st):
+    digest = hashlib.sha1(f"{video_path}:{st.st_mtime_ns}:{st.st_size}".encode()).hexdigest()
+    return f"{digest}.jpg"
+
+
+class ThumbnailService:
+    """Liefert Thumbnails: vorhandene _thumb.jpg, sonst Cache, sonst neu erzeugt.
+
+    Das Dekodieren läuft in einem Prozess-Pool, gleichzeitige Anfragen für
+    denselben Clip teilen sich einen Job. Dateisystemzugriffe laufen über den
+    begrenzten Pool `offload`. Neue Clips aus dem RecordingsIndex werden im
+    Hintergrund vorgewärmt.
+    """
+
+    def __init__(self, offload, cache=None, workers=THUMBNAIL_WORKERS, width=THUMBNAIL_WIDTH):
+        self.offload = offload
+        self.cache = cache or DiskLRUCache(THUMBNAIL_CACHE_DIR, THUMBNAIL_CACHE_MAX_BYTES)
+        self.workers = workers
+        self.width = width
+        self._pool = None
+        self._inflight = {}
+        self._loop = None
+        self._warmup_queue = None
+        self._warmup_task = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn statt fork: der Elternprozess hat Threads (watchdog, Katalog)
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def get(self, video_path):
+        """Pfad zu einem Thumbnail für `video_path` oder None."""
+        legacy_path = get_thumbnail_path(video_path)
+        if await self.offload.run(os.path.isfile, legacy_path):
+            return legacy_path
+
+        try:
+            st = await self.offload.run(os.stat, video_path)
+        except OSError:
+            return None
+        key = _cache_key(video_path, st)
+        cached = await self.offload.run(self.cache.get, key)
+        if cached is not None:
+            return cached
+
+        job = self._inflight.get(key)
+        if job is None:
+            # Eigene Task statt Future des ersten Aufrufers: bricht ein Client
+            # ab, warten die übrigen weiter auf dasselbe Ergebnis
+            job = asyncio.create_task(self._generate(video_path, key), name=f"thumbnail-{key}")
+            self._inflight[key] = job
+            job.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(job)
+
+    async def _generate(self, video_path, key):
+        loop = asyncio.get_running_loop()
+        temp_path = self.cache.temp_path(key)
+        try:
+            await loop.run_in_executor(self._get_pool(), extract_thumbnail, video_path, temp_path, self.width)
+            return await self.offload.run(self.cache.commit, key, temp_path)
+        except Exception as e:
+            print(f"Fehler beim Erzeugen des Thumbnails für {video_path}: {e}")
+            await self.offload.run(_remove_quietly, temp_path)
+            return None
+
+    # ---- Vorwärmen ------------------------------------------------------
+
+    def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._warmup_queue = asyncio.Queue(maxsize=THUMBNAIL_WARMUP_QUEUE)
+        self._warmup_task = asyncio.create_task(self._warmup_worker(), name="thumbnail-warmup")
+
+    async def stop(self):
+        if self._warmup_task is not None:
+            self._warmup_task.cancel()
+        for job in list(self._inflight.values()):
+            job.cancel()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def on_index_event(self, event, path):
+        """Listener für RecordingsIndex.add_listener (läuft im watchdog-Thread)."""
+        if event == "removed" or self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._enqueue_warmup, path)
+
+    def _enqueue_warmup(self, path):
+        try:
+            self._warmup_queue.put_nowait(path)
+        except asyncio.QueueFull:
+            pass
+
+    async def _warmup_worker(self):
+        while True:
+            path = await self._warmup_queue.get()
+            try:
+                st = await self.offload.run(os.stat, path)
+                # nur frische, fertig geschriebene Clips; alte kommen bei Bedarf dran
+                if st.st_size == 0 or time.time() - st.st_mtime > THUMBNAIL_WARMUP_MAX_AGE:
+                    continue
+                await self.get(path)
+            except OSError:
+                continue
+            except (OffloadRejected, OffloadTimeout):
+                # Pool ausgelastet: Vorwärmen hat keinen Vorrang vor Anfragen
+                continue
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,273 @@
+import os
+import time
+import asyncio
+import threading
+import concurrent.futures
+
+from modules.offload import OffloadRejected
+
+TIMELINE_MAX_SPAN = float(os.getenv("TIMELINE_MAX_SPAN", str(6 * 3600)))  # Sekunden pro Anfrage
+TIMELINE_MAX_STREAMS = int(os.getenv("TIMELINE_MAX_STREAMS", "2"))  # gleichzeitige Remux-Threads
+TIMELINE_QUEUE_CHUNKS = int(os.getenv("TIMELINE_QUEUE_CHUNKS", "16"))  # gepufferte Schreibblöcke
+TIMELINE_IDLE_TIMEOUT = float(os.getenv("TIMELINE_IDLE_TIMEOUT", "30"))  # Sekunden ohne Abnahme durch den Client
+
+# Fragmentiertes MP4: moov vorne, danach eigenständige Fragmente -> ohne Seek schreibbar
+_FRAGMENTED_MP4 = {"movflags": "frag_keyframe+empty_moov+default_base_moof"}
+
+
+class TimelineCancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Datei-Objekt für PyAV: jeder write() landet in der asyncio.Queue des Loops.
+
+    Ist die Queue voll, blockiert der Remux-Thread (Backpressure) – bis der
+    Client weiterliest, die Verbindung abgebrochen wird oder `idle_timeout`
+    Sekunden lang nichts abgenommen wurde (z. B. weil der Body-Generator
+    nach einem Verbindungsabbruch nie mehr weiterläuft)."""
+
+    def __init__(self, loop, queue, cancelled, idle_timeout=TIMELINE_IDLE_TIMEOUT):
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = cancelled
+        self.idle_timeout = idle_timeout
+
+    def put(self, item):
+        if self.cancelled.is_set():
+            raise TimelineCancelled()
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        deadline = time.monotonic() + self.idle_timeout
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if self.cancelled.is_set() or time.monotonic() >= deadline:
+                    self.cancelled.set()
+                    future.cancel()
+                    raise TimelineCancelled()
+
+    def write(self, data):
+        self.put(bytes(data))
+        return len(data)
+
+
+def _same_format(a, b):
+    return (a.codec_context.name, a.codec_context.width, a.codec_context.height) == \
+        (b.codec_context.name, b.codec_context.width, b.codec_context.height)
+
+
+def _same_audio_format(a, b):
+    return (a.codec_context.name, a.codec_context.sample_rate, a.codec_context.layout.name) == \
+        (b.codec_context.name, b.codec_context.sample_rate, b.codec_context.layout.name)
+
+
+def remux_timeline(segments, start, end, out, on_start=None):
+    """Hängt die Aufnahmen per Stream-Copy zu einem fragmentierten MP4 zusammen.
+
+    `segments` sind Katalogzeilen (path, start_ts) aufsteigend. Im ersten Segment
+    wird zum Keyframe vor `start` gesprungen; die Ausgabe beginnt bei diesem
+    Keyframe, dessen Wanduhrzeit an on_start(origin) geht. Ausgabezeit
+    t entspricht damit der Wanduhrzeit origin + t, Lücken zwischen Aufnahmen
+    bleiben erhalten. Zeitstempel werden pro Segment verschoben und streng
+    monoton gehalten. Ton wird mitkopiert, wenn schon das erste Segment eine
+    Tonspur hat (die Spuren des fragmentierten MP4 stehen ab dem Header fest);
+    Segmente ohne oder mit abweichender Tonspur bleiben dann stumm.
+    Blockiert, gehört in einen Thread.
+    """
+    import av
+
+    output = av.open(out, "w", format="mp4", options=_FRAGMENTED_MP4)
+    try:
+        template = None
+        audio_template = None
+        out_stream = None
+        out_audio = None
+        origin = None
+        last_dts = None  # Sekunden in der Ausgabe
+        last_audio_dts = None
+
+        for segment in segments:
+            if segment["start_ts"] > end:
+                break
+            try:
+                container = av.open(segment["path"])
+            except (OSError, av.error.FFmpegError) as e:
+                print(f"Timeline: {segment['path']} übersprungen: {e}")
+                continue
+
+            with container:
+                if not container.streams.video:
+                    continue
+                stream = container.streams.video[0]
+                audio = container.streams.audio[0] if container.streams.audio else None
+                if template is None:
+                    template = stream
+                    out_stream = output.add_stream_from_template(stream)
+                    if audio is not None:
+                        audio_template = audio
+                        out_audio = output.add_stream_from_template(audio)
+                elif not _same_format(template, stream):
+                    # Stream-Copy verträgt keinen Codec-/Auflösungswechsel
+                    print(f"Timeline: {segment['path']} hat ein anderes Format, übersprungen")
+                    continue
+                if audio is not None and (out_audio is None or not _same_audio_format(audio_template, audio)):
+                    audio = None
+
+                seg_start = segment["start_ts"]
+                if container.duration is not None and seg_start + container.duration / av.time_base < start:
+                    continue  # endet vor dem gewünschten Zeitraum
+                time_base = stream.time_base
+                first_pts = stream.start_time or 0
+                if seg_start < start:
+                    container.seek(first_pts + int((start - seg_start) / time_base), stream=stream)
+
+                shift = None
+                audio_shift = None
+                for packet in container.demux([s for s in (stream, audio) if s is not None]):
+                    if packet.pts is None or packet.dts is None:
+                        continue
+                    if packet.stream is audio:
+                        # Ton folgt der Verschiebung des Videos im selben Segment
+                        if shift is None:
+                            continue
+                        if audio_shift is None:
+                            audio_shift = round(float(shift * time_base) / audio.time_base)
+                        packet.pts += audio_shift
+                        packet.dts += audio_shift
+                        dts = float(packet.dts * audio.time_base)
+                        if dts < 0 or dts > end - origin or (last_audio_dts is not None and dts <= last_audio_dts):
+                            continue
+                        last_audio_dts = dts
+                        packet.stream = out_audio
+                        output.mux(packet)
+                        continue
+
+                    wall = seg_start + float((packet.pts - first_pts) * time_base)
+                    if wall > end:
+                        return
+                    if origin is None:
+                        # ohne Keyframe am Anfang kann der Client nicht dekodieren
+                        if not packet.is_keyframe:
+                            continue
+                        origin = wall
+                        if on_start is not None:
+                            on_start(origin)
+                    if shift is None:
+                        shift = round((seg_start - origin) / time_base) - first_pts
+                        if last_dts is not None and (packet.dts + shift) * time_base <= last_dts:
+                            shift = int(last_dts / time_base) + 1 - packet.dts
+                    packet.pts += shift
+                    packet.dts += shift
+                    if last_dts is not None and packet.dts * time_base <= last_dts:
+                        continue
+                    last_dts = float(packet.dts * time_base)
+                    packet.stream = out_stream
+                    output.mux(packet)
+    finally:
+        output.close()
+
+
+class TimelineStream:
+    def __init__(self, origin, queue, cancelled):
+        self.origin = origin
+        self._queue = queue
+        self._cancelled = cancelled
+
+    async def body(self):
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    print(f"Fehler beim Zusammensetzen der Timeline: {item}")
+                    break
+                yield item
+        finally:
+            # Verbindung zu oder fertig: Remux-Thread beendet sich beim nächsten write()
+            self._cancelled.set()
+
+    def close(self):
+        self._cancelled.set()
+
+
+class TimelineStreamer:
+    """Startet Remux-Threads für /timeline und begrenzt ihre Anzahl.
+
+    Der Thread schreibt über eine kleine Queue in die StreamingResponse; ein
+    langsamer Client bremst den Remux, statt dass sich Daten im Speicher stauen.
+    """
+
+    def __init__(self, max_streams=TIMELINE_MAX_STREAMS, queue_chunks=TIMELINE_QUEUE_CHUNKS):
+        self.max_streams = max_streams
+        self.queue_chunks = queue_chunks
+        self.active = 0
+        self._lock = threading.Lock()
+        self._cancel_events = set()
+
+    def _release(self, cancelled):
+        with self._lock:
+            self.active -= 1
+            self._cancel_events.discard(cancelled)
+
+    async def open(self, segments, start, end):
+        """Startet den Remux und wartet auf den ersten Keyframe.
+
+        Liefert einen TimelineStream oder None, wenn im Zeitraum kein Video liegt."""
+        with self._lock:
+            if self.active >= self.max_streams:
+                raise OffloadRejected("timeline")
+            self.active += 1
+            cancelled = threading.Event()
+            self._cancel_events.add(cancelled)
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.queue_chunks)
+        started = loop.create_future()
+        writer = _QueueWriter(loop, queue, cancelled)
+
+        def resolve(origin):
+            if not started.done():
+                started.set_result(origin)
+
+        def run():
+            try:
+                remux_timeline(segments, start, end, writer,
+                               on_start=lambda origin: loop.call_soon_threadsafe(resolve, origin))
+                writer.put(None)
+            except TimelineCancelled:
+                pass
+            except Exception as e:
+                try:
+                    writer.put(e)
+                except TimelineCancelled:
+                    pass
+            finally:
+                self._release(cancelled)
+                try:
+                    loop.call_soon_threadsafe(resolve, None)
+                except RuntimeError:
+                    pass  # Loop bereits beendet
+
+        threading.Thread(target=run, name="timeline-remux", daemon=True).start()
+
+        try:
+            origin = await started
+        except BaseException:
+            cancelled.set()
+            raise
+        if origin is None:
+            cancelled.set()
+            while not queue.empty():
+                item = queue.get_nowait()
+                if isinstance(item, Exception):
+                    print(f"Fehler beim Zusammensetzen der Timeline: {item}")
+            return None
+        return TimelineStream(origin, queue, cancelled)
+
+    def stop(self):
+        with self._lock:
+            for cancelled in self._cancel_events:
+                cancelled.set()
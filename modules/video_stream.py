@@ -0,0 +1,263 @@
+import os
+import asyncio
+import secrets
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+
+from starlette.responses import Response
+
+VIDEO_CHUNK_SIZE = int(os.getenv("VIDEO_CHUNK_SIZE", str(256 * 1024)))  # Bytes pro Lesevorgang
+MAX_RANGES = 32  # mehr Teilbereiche werden ignoriert (-> komplette Datei)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, file_size):
+    """Parst einen Range-Header (RFC 9110) zu einer Liste von (start, end) inklusive.
+
+    Gibt None zurück, wenn der Header ignoriert werden soll (Syntaxfehler,
+    andere Einheit, zu viele Bereiche). Wirft RangeNotSatisfiable, wenn kein
+    Bereich innerhalb der Datei liegt.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, sep, last = part.partition("-")
+        if not sep:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Suffix-Range: die letzten N Bytes
+                length = int(last)
+                if length <= 0:
+                    continue
+                ranges.append((max(0, file_size - length), file_size - 1))
+                continue
+            start = int(first)
+            end = int(last) if last else None
+        except ValueError:
+            return None
+        if end is not None and start > end:
+            return None
+        if start >= file_size:
+            continue
+        ranges.append((start, file_size - 1 if end is None else min(end, file_size - 1)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    # Überlappende oder direkt angrenzende Bereiche zusammenfassen
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def make_etag(st):
+    # Inode dabei: eine per os.replace ausgetauschte Datei bekommt sonst womöglich dasselbe ETag
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+def _etag_matches(header, etag, weak=True):
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if weak and candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _not_modified_since(header, mtime):
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def _if_range_matches(header, etag, last_modified):
+    header = header.strip()
+    if header.startswith('"') or header.startswith("W/"):
+        # If-Range verlangt einen starken Vergleich
+        return header == etag
+    return header == last_modified
+
+
+class RangeFileResponse(Response):
+    """Streamt eine Datei oder Teilbereiche davon in begrenzten Blöcken.
+
+    Gelesen wird mit os.pread in einem Worker-Thread, sodass der Event-Loop nie
+    blockiert und pro Verbindung höchstens ein Block im Speicher liegt. Bietet
+    der Server die ASGI-Erweiterung "http.response.zerocopysend" an, wird
+    stattdessen sendfile genutzt.
+    """
+
+    def __init__(self, path, status_code, headers, ranges=(), boundary=None,
+                 content_type=None, file_size=0, send_body=True, chunk_size=VIDEO_CHUNK_SIZE):
+        super().__init__(status_code=status_code, headers=headers)
+        self.path = path
+        self.ranges = ranges
+        self.boundary = boundary
+        self.content_type = content_type
+        self.file_size = file_size
+        self.send_body = send_body
+        self.chunk_size = chunk_size
+
+    def _parts(self):
+        """(Teil-Header, start, end) für jeden auszuliefernden Bereich."""
+        if self.boundary is None:
+            return [(b"", start, end) for start, end in self.ranges]
+        return [
+            (
+                (
+                    f"--{self.boundary}\r\n"
+                    f"Content-Type: {self.content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{self.file_size}\r\n\r\n"
+                ).encode(),
+                start,
+                end,
+            )
+            for start, end in self.ranges
+        ]
+
+    def content_length(self):
+        parts = self._parts()
+        length = sum(len(header) + end - start + 1 for header, start, end in parts)
+        if self.boundary is not None:
+            length += 2 * (len(parts) - 1) + len(self._closing())
+        return length
+
+    def _closing(self):
+        return f"\r\n--{self.boundary}--\r\n".encode()
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        send_task = asyncio.ensure_future(self._send_body(scope, send))
+        disconnect_task = asyncio.ensure_future(self._wait_disconnect(receive))
+        try:
+            await asyncio.wait({send_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (send_task, disconnect_task):
+                if not task.done():
+                    task.cancel()
+        if send_task.done() and not send_task.cancelled():
+            send_task.result()
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+
+    async def _send_body(self, scope, send):
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        file = await asyncio.to_thread(open, self.path, "rb")
+        try:
+            for index, (header, start, end) in enumerate(self._parts()):
+                if index > 0 and self.boundary is not None:
+                    header = b"\r\n" + header
+                if header:
+                    await send({"type": "http.response.body", "body": header, "more_body": True})
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": file,
+                        "offset": start,
+                        "count": end - start + 1,
+                        "more_body": True,
+                    })
+                    continue
+                position = start
+                while position <= end:
+                    size = min(self.chunk_size, end - position + 1)
+                    chunk = await asyncio.to_thread(os.pread, file.fileno(), size, position)
+                    if not chunk:
+                        # Datei wurde währenddessen gekürzt
+                        return
+                    position += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            trailer = self._closing() if self.boundary is not None else b""
+            await send({"type": "http.response.body", "body": trailer, "more_body": False})
+        finally:
+            await asyncio.to_thread(file.close)
+
+
+def build_file_response(request_headers, method, path, st, media_type=None):
+    """Erzeugt die passende Antwort (200/206/304/416) für eine Datei inkl. Caching-Headern."""
+    media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    file_size = st.st_size
+    etag = make_etag(st)
+    last_modified = formatdate(st.st_mtime, usegmt=True)
+    send_body = method != "HEAD"
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+    }
+
+    if_none_match = request_headers.get("if-none-match")
+    if_modified_since = request_headers.get("if-modified-since")
+    if (if_none_match and _etag_matches(if_none_match, etag)) or (
+        not if_none_match and if_modified_since and _not_modified_since(if_modified_since, st.st_mtime)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    ranges = None
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    if range_header and (not if_range or _if_range_matches(if_range, etag, last_modified)):
+        try:
+            ranges = parse_range_header(range_header, file_size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{file_size}"
+            return Response(status_code=416, headers=headers)
+
+    if not ranges:
+        status_code, boundary = 200, None
+        ranges = [(0, file_size - 1)] if file_size else []
+        headers["Content-Type"] = media_type
+    elif len(ranges) == 1:
+        status_code, boundary = 206, None
+        start, end = ranges[0]
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Type"] = media_type
+    else:
+        status_code, boundary = 206, secrets.token_hex(16)
+        headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+
+    response = RangeFileResponse(
+        path,
+        status_code=status_code,
+        headers=headers,
+        ranges=ranges,
+        boundary=boundary,
+        content_type=media_type,
+        file_size=file_size,
+        send_body=send_body,
+    )
+    response.headers["Content-Length"] = str(response.content_length())
+    return response
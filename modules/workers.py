@@ -0,0 +1,343 @@
+import os
+import json
+import fcntl
+import asyncio
+import itertools
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from modules.serialization import encode
+
+# Gleiche Variable wie bei uvicorn --workers; erst ab 2 Workern wird ein Leader gewählt
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+WORKER_LOCK_PATH = os.getenv("WORKER_LOCK_PATH", "data/leader.lock")
+WORKER_SOCKET_PATH = os.getenv("WORKER_SOCKET_PATH", "data/leader.sock")
+WORKER_RETRY_INTERVAL = float(os.getenv("WORKER_RETRY_INTERVAL", "2"))  # Sekunden
+WORKER_CALL_TIMEOUT = float(os.getenv("WORKER_CALL_TIMEOUT", "60"))  # Sekunden
+WORKER_STREAM_BUFFER = 16  # Nachrichten pro Stream beim Follower, ältere werden verworfen
+
+_LINE_LIMIT = 16 * 1024 * 1024
+
+
+class RemoteError(HTTPException):
+    """Fehler aus dem Leader-Prozess; Status und Meldung werden unverändert weitergereicht."""
+
+
+class LeaderLock:
+    """Exklusiver flock auf eine Datei. Der Kernel gibt ihn frei, sobald der Prozess endet."""
+
+    def __init__(self, path=WORKER_LOCK_PATH):
+        self.path = path
+        self._fd = None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+
+def _line(message):
+    return encode(message).encode() + b"\n"
+
+
+class LeaderServer:
+    """Unix-Socket des Leaders, eine JSON-Nachricht pro Zeile.
+
+    {"id": n, "op": ..., "args": {...}} ruft `calls[op]` auf und bekommt
+    {"id": n, "result": ...} bzw. {"id": n, "error": ..., "status": ...}.
+    Für Ops aus `streams` folgt stattdessen je Element {"id": n, "data": ...},
+    bis der Follower {"id": n, "op": "cancel"} schickt. Ohne id wird nicht
+    geantwortet.
+    """
+
+    def __init__(self, calls, streams, path=WORKER_SOCKET_PATH):
+        self.calls = calls
+        self.streams = streams
+        self.path = path
+        self._server = None
+
+    async def start(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path, limit=_LINE_LIMIT)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+    async def _handle(self, reader, writer):
+        tasks = {}
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                request_id, op, args = message.get("id"), message["op"], message.get("args", {})
+                if op == "cancel":
+                    task = tasks.pop(request_id, None)
+                    if task is not None:
+                        task.cancel()
+                    continue
+                if op in self.streams:
+                    task = asyncio.create_task(self._stream(writer, request_id, op, args))
+                else:
+                    task = asyncio.create_task(self._call(writer, request_id, op, args))
+                key = request_id if request_id is not None else object()
+                tasks[key] = task
+                task.add_done_callback(lambda _, key=key: tasks.pop(key, None))
+        except (ConnectionError, ValueError, KeyError) as e:
+            print(f"Fehler auf der Worker-Verbindung: {e}")
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            writer.close()
+
+    async def _call(self, writer, request_id, op, args):
+        try:
+            handler = self.calls.get(op)
+            if handler is None:
+                raise HTTPException(status_code=400, detail=f"Unbekannte Operation: {op}")
+            reply = {"id": request_id, "result": jsonable_encoder(await handler(**args))}
+        except HTTPException as e:
+            reply = {"id": request_id, "error": e.detail, "status": e.status_code}
+        except Exception as e:
+            reply = {"id": request_id, "error": str(e), "status": 500}
+        if request_id is not None:
+            await self._send(writer, reply)
+
+    async def _stream(self, writer, request_id, op, args):
+        try:
+            async for item in self.streams[op](**args):
+                await self._send(writer, {"id": request_id, "data": item})
+        except ConnectionError:
+            pass
+        except Exception as e:
+            await self._send(writer, {"id": request_id, "error": str(e), "status": 500})
+
+    @staticmethod
+    async def _send(writer, message):
+        if writer.is_closing():
+            raise ConnectionError("Follower getrennt")
+        writer.write(_line(message))
+        await writer.drain()
+
+
+class LeaderClient:
+    """Verbindung eines Followers zum Leader (Gegenstück zu LeaderServer)."""
+
+    def __init__(self, path=WORKER_SOCKET_PATH):
+        self.path = path
+        self._writer = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._reader_task = None
+        self.lost = None
+
+    async def connect(self):
+        reader, self._writer = await asyncio.open_unix_connection(self.path, limit=_LINE_LIMIT)
+        self.lost = asyncio.Event()
+        self._reader_task = asyncio.create_task(self._read_loop(reader), name="leader-client")
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+
+    async def _read_loop(self, reader):
+        try:
+            while line := await reader.readline():
+                message = json.loads(line)
+                queue = self._pending.get(message.get("id"))
+                if queue is None:
+                    continue
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait(message)
+        except (ConnectionError, ValueError) as e:
+            print(f"Fehler auf der Leader-Verbindung: {e}")
+        finally:
+            for queue in self._pending.values():
+                if queue.full():
+                    queue.get_nowait()
+                queue.put_nowait({"error": "Verbindung zum Leader verloren", "status": 503})
+            self._pending.clear()
+            self.lost.set()
+
+    def _send(self, message):
+        if self.lost.is_set() or self._writer.is_closing():
+            raise RemoteError(status_code=503, detail="Keine Verbindung zum Leader")
+        self._writer.write(_line(message))
+
+    def notify(self, op, **args):
+        self._send({"op": op, "args": args})
+
+    async def call(self, op, **args):
+        request_id = next(self._ids)
+        queue = self._pending[request_id] = asyncio.Queue(maxsize=1)
+        try:
+            self._send({"id": request_id, "op": op, "args": args})
+            try:
+                message = await asyncio.wait_for(queue.get(), WORKER_CALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                raise RemoteError(status_code=504, detail=f"Leader antwortet nicht ({op})")
+        finally:
+            self._pending.pop(request_id, None)
+        if "error" in message:
+            raise RemoteError(status_code=message.get("status", 500), detail=message["error"])
+        return message["result"]
+
+    async def stream(self, op, **args):
+        request_id = next(self._ids)
+        queue = self._pending[request_id] = asyncio.Queue(maxsize=WORKER_STREAM_BUFFER)
+        try:
+            self._send({"id": request_id, "op": op, "args": args})
+            while True:
+                message = await queue.get()
+                if "error" in message:
+                    raise RemoteError(status_code=message.get("status", 500), detail=message["error"])
+                yield message["data"]
+        finally:
+            if self._pending.pop(request_id, None) is not None:
+                try:
+                    self._send({"id": request_id, "op": "cancel"})
+                except RemoteError:
+                    pass
+
+
+async def _unavailable():
+    raise RemoteError(status_code=503, detail="Keine Verbindung zum Leader")
+    yield
+
+
+class WorkerCluster:
+    """Rollen unter mehreren uvicorn-Workern (WEB_CONCURRENCY > 1).
+
+    Wer den flock hält, ist Leader: nur er sammelt Systemdaten, pflegt den
+    Aufnahme-Index und hält die iCloud-Sessions (`on_leader`). Er bedient
+    `calls` und `streams` über einen Unix-Socket. Follower leiten diese Ops
+    dorthin weiter (`on_follower(client)`) und lesen den SQLite-Katalog
+    direkt. Stirbt der Leader, wählen die Follower neu; der Gewinner
+    übernimmt per `on_leader`. Mit einem Worker ist der Prozess ohne Socket
+    sofort Leader.
+    """
+
+    def __init__(self, calls, streams, on_leader, on_follower, workers=WEB_CONCURRENCY,
+                 lock_path=WORKER_LOCK_PATH, socket_path=WORKER_SOCKET_PATH, retry_interval=WORKER_RETRY_INTERVAL):
+        self.calls = calls
+        self.streams = streams
+        self.on_leader = on_leader
+        self.on_follower = on_follower
+        self.enabled = workers > 1
+        self.retry_interval = retry_interval
+        self.socket_path = socket_path
+        self.lock = LeaderLock(lock_path)
+        self.server = LeaderServer(calls, streams, socket_path)
+        self.is_leader = False
+        self.client = None
+        self._watch_task = None
+
+    @property
+    def role(self):
+        if not self.enabled:
+            return "single"
+        return "leader" if self.is_leader else "follower"
+
+    async def start(self):
+        if not self.enabled:
+            self.is_leader = True
+            await self.on_leader()
+            return
+        if await self._connect():
+            self._watch_task = asyncio.create_task(self._watch(), name="worker-cluster")
+        print(f"Worker {os.getpid()}: {self.role}")
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        if self.client is not None:
+            await self.client.close()
+        await self.server.stop()
+        self.lock.release()
+
+    async def _try_lead(self):
+        if not self.lock.try_acquire():
+            return False
+        self.is_leader = True
+        await self.server.start()
+        await self.on_leader()
+        return True
+
+    async def _connect(self):
+        """Leader werden oder mit dem Leader verbinden; True, wenn wir Follower sind."""
+        while True:
+            if await self._try_lead():
+                return False
+            client = LeaderClient(self.socket_path)
+            try:
+                await client.connect()
+            except OSError:
+                # Leader startet noch oder ist gerade weg: gleich neu wählen
+                await asyncio.sleep(self.retry_interval)
+                continue
+            self.client = client
+            self.on_follower(client)
+            return True
+
+    async def _watch(self):
+        while True:
+            await self.client.lost.wait()
+            print(f"Worker {os.getpid()}: Verbindung zum Leader verloren, neue Wahl")
+            self.client = None
+            if not await self._connect():
+                print(f"Worker {os.getpid()}: übernimmt als Leader")
+                return
+
+    async def run(self, op, **args):
+        """Op beim Leader ausführen: lokal, wenn wir es selbst sind, sonst über den Socket."""
+        if self.is_leader:
+            return await self.calls[op](**args)
+        if self.client is None:
+            raise RemoteError(status_code=503, detail="Keine Verbindung zum Leader")
+        return await self.client.call(op, **args)
+
+    def stream(self, op, **args):
+        """Asynchroner Iterator über einen Stream des Leaders (lokal oder über den Socket)."""
+        if self.is_leader:
+            return self.streams[op](**args)
+        if self.client is None:
+            return _unavailable()
+        return self.client.stream(op, **args)
+
+    def notify(self, op, **args):
+        """Wie run(), aber ohne auf das Ergebnis zu warten; bei fehlender Verbindung verworfen."""
+        if self.is_leader:
+            asyncio.ensure_future(self.calls[op](**args))
+        elif self.client is not None:
+            try:
+                self.client.notify(op, **args)
+            except RemoteError:
+                pass
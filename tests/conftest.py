@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests laufen aus dem Repo-Wurzelverzeichnis heraus gegen die Module unter modules/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
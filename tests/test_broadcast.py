@@ -0,0 +1,19 @@
+from modules.broadcast import merge_patch
+
+
+def test_unchanged_is_empty():
+    assert merge_patch({"a": 1, "b": {"c": 2}}, {"a": 1, "b": {"c": 2}}) == {}
+
+
+def test_changed_added_and_removed_keys():
+    assert merge_patch({"a": 1, "b": 2}, {"a": 3, "c": 4}) == {"a": 3, "b": None, "c": 4}
+
+
+def test_nested_dicts_only_carry_changes():
+    old = {"cpu": {"load": 1.0, "temp": 50}, "mem": {"used": 10}}
+    new = {"cpu": {"load": 2.0, "temp": 50}, "mem": {"used": 10}}
+    assert merge_patch(old, new) == {"cpu": {"load": 2.0}}
+
+
+def test_lists_and_type_changes_are_replaced():
+    assert merge_patch({"a": [1, 2], "b": {"x": 1}}, {"a": [1, 3], "b": 5}) == {"a": [1, 3], "b": 5}
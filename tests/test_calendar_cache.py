@@ -0,0 +1,68 @@
+from datetime import date
+
+from modules.calendar_cache import CalendarIntervalCache
+
+
+def _day(d):
+    return [int(d.strftime("%Y%m%d")), d.year, d.month, d.day, 0, 0, 0]
+
+
+class _Fetcher:
+    def __init__(self, events=()):
+        self.calls = []
+        self.events = list(events)
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        return [e for e in self.events if start <= date(*e["startDate"][1:4]) <= end]
+
+
+def test_only_gaps_are_fetched():
+    cache = CalendarIntervalCache(ttl=300)
+    fetch = _Fetcher()
+    cache.get_events("acc", date(2026, 1, 1), date(2026, 1, 10), fetch)
+    cache.get_events("acc", date(2026, 1, 20), date(2026, 1, 31), fetch)
+    cache.get_events("acc", date(2026, 1, 5), date(2026, 1, 25), fetch)
+    assert fetch.calls == [
+        (date(2026, 1, 1), date(2026, 1, 10)),
+        (date(2026, 1, 20), date(2026, 1, 31)),
+        (date(2026, 1, 11), date(2026, 1, 19)),
+    ]
+
+
+def test_adjacent_intervals_are_merged():
+    cache = CalendarIntervalCache(ttl=300)
+    fetch = _Fetcher()
+    cache.get_events("acc", date(2026, 1, 1), date(2026, 1, 10), fetch)
+    cache.get_events("acc", date(2026, 1, 11), date(2026, 1, 20), fetch)
+    account = cache._account("acc")
+    assert [(s, e) for s, e, _ in account.intervals] == [(date(2026, 1, 1), date(2026, 1, 20))]
+    cache.get_events("acc", date(2026, 1, 3), date(2026, 1, 18), fetch)
+    assert len(fetch.calls) == 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_events_are_filtered_to_the_requested_range():
+    events = [
+        {"guid": "a", "startDate": _day(date(2026, 1, 2)), "endDate": _day(date(2026, 1, 2))},
+        {"guid": "b", "startDate": _day(date(2026, 1, 8)), "endDate": _day(date(2026, 1, 8))},
+    ]
+    cache = CalendarIntervalCache(ttl=300)
+    fetch = _Fetcher(events)
+    cache.get_events("acc", date(2026, 1, 1), date(2026, 1, 10), fetch)
+    result = cache.get_events("acc", date(2026, 1, 5), date(2026, 1, 9), fetch)
+    assert [e["guid"] for e in result] == ["b"]
+
+
+def test_invalidate_splits_intervals():
+    cache = CalendarIntervalCache(ttl=300)
+    fetch = _Fetcher()
+    cache.get_events("acc", date(2026, 1, 1), date(2026, 1, 31), fetch)
+    cache.invalidate("acc", date(2026, 1, 10), date(2026, 1, 12))
+    account = cache._account("acc")
+    assert [(s, e) for s, e, _ in account.intervals] == [
+        (date(2026, 1, 1), date(2026, 1, 9)),
+        (date(2026, 1, 13), date(2026, 1, 31)),
+    ]
+    cache.get_events("acc", date(2026, 1, 1), date(2026, 1, 31), fetch)
+    assert fetch.calls[-1] == (date(2026, 1, 10), date(2026, 1, 12))
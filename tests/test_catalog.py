@@ -0,0 +1,55 @@
+import pytest
+
+from modules.catalog import RecordingsCatalog, decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    base = tmp_path / "cctv"
+    catalog = RecordingsCatalog(str(tmp_path / "recordings.db"), str(base))
+    for camera in ("cam1", "cam2"):
+        day = base / camera / "2026-01-01"
+        day.mkdir(parents=True)
+        for minute in range(5):
+            path = day / f"{camera}_20260101_12{minute:02d}00.mp4"
+            path.write_bytes(b"x")
+            catalog.on_index_event("added", str(path))
+    catalog.start()
+    catalog.stop()  # Schreib-Thread arbeitet die Queue vor dem Beenden ab
+    return catalog
+
+
+def _pages(catalog, **kwargs):
+    pages, cursor = [], None
+    while True:
+        items, cursor = catalog.query(cursor=cursor, **kwargs)
+        pages.append([item["path"].rsplit("/", 1)[1] for item in items])
+        if cursor is None:
+            return pages
+
+
+def test_keyset_pagination_covers_everything_once(catalog):
+    pages = _pages(catalog, limit=3)
+    assert [len(page) for page in pages] == [3, 3, 3, 1]
+    flat = [name for page in pages for name in page]
+    assert len(flat) == len(set(flat)) == 10
+    # gleicher Startzeitpunkt: Reihenfolge über den Pfad
+    assert flat[:2] == ["cam1_20260101_120000.mp4", "cam2_20260101_120000.mp4"]
+
+
+def test_descending_order_and_camera_filter(catalog):
+    pages = _pages(catalog, camera="cam2", limit=2, order="desc")
+    assert [name for page in pages for name in page] == [
+        f"cam2_20260101_12{minute:02d}00.mp4" for minute in reversed(range(5))
+    ]
+
+
+def test_last_page_has_no_cursor(catalog):
+    items, cursor = catalog.query(limit=10)
+    assert len(items) == 10 and cursor is None
+
+
+def test_cursor_roundtrip_and_invalid_cursor(catalog):
+    assert decode_cursor(encode_cursor(1.5, "/a/b.mp4")) == (1.5, "/a/b.mp4")
+    with pytest.raises(ValueError):
+        catalog.query(cursor="kaputt")
@@ -0,0 +1,48 @@
+from modules.disk_cache import DiskLRUCache
+
+
+def _put(cache, key, size):
+    temp = cache.temp_path(key)
+    with open(temp, "wb") as f:
+        f.write(b"x" * size)
+    return cache.commit(key, temp)
+
+
+def _count_scans(cache):
+    scans = []
+    scan = cache._scan
+    cache._scan = lambda: (scans.append(1), scan())[1]
+    return scans
+
+
+def test_commit_below_limit_does_not_rescan(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"), 1000, lock_dir=str(tmp_path / "locks"))
+    scans = _count_scans(cache)
+    for i in range(5):
+        _put(cache, f"k{i}", 150)
+    assert scans == []
+    assert cache.stats()["bytes"] == 750
+
+
+def test_commit_over_limit_evicts_oldest(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"), 1000, lock_dir=str(tmp_path / "locks"))
+    for i in range(5):
+        _put(cache, f"k{i}", 150)
+    _put(cache, "big", 400)
+    assert cache.get("k0") is None
+    assert cache.get("big") is not None
+    assert cache.stats()["bytes"] <= 1000
+
+
+def test_commit_rescans_after_interval(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"), 1000, rescan_interval=0, lock_dir=str(tmp_path / "locks"))
+    scans = _count_scans(cache)
+    _put(cache, "a", 10)
+    assert scans == [1]
+
+
+def test_lock_file_stays_out_of_cache_dir(tmp_path):
+    cache = DiskLRUCache(str(tmp_path / "cache"), 1000, lock_dir=str(tmp_path / "locks"))
+    _put(cache, "a", 10)
+    assert sorted(p.name for p in (tmp_path / "cache").iterdir()) == ["a"]
+    assert len(list((tmp_path / "locks").iterdir())) == 1
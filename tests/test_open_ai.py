@@ -0,0 +1,31 @@
+from modules.open_ai import split_sentences
+
+
+def test_splits_on_sentence_ends():
+    text = "Das ist der erste Satz. Und hier kommt der zweite! Ist das der dritte?"
+    assert split_sentences(text, min_chars=10) == [
+        "Das ist der erste Satz.",
+        "Und hier kommt der zweite!",
+        "Ist das der dritte?",
+    ]
+
+
+def test_short_sentences_are_joined_with_the_next():
+    assert split_sentences("Ja. Nein. Das ist ein längerer Satz.", min_chars=15) == [
+        "Ja. Nein. Das ist ein längerer Satz.",
+    ]
+
+
+def test_remainder_is_kept():
+    assert split_sentences("Ein ausreichend langer Satz. Ok.", min_chars=10) == [
+        "Ein ausreichend langer Satz.",
+        "Ok.",
+    ]
+
+
+def test_paragraphs_and_empty_text():
+    assert split_sentences("Absatz eins ohne Punkt\n\nAbsatz zwei", min_chars=5) == [
+        "Absatz eins ohne Punkt",
+        "Absatz zwei",
+    ]
+    assert split_sentences("   ") == []
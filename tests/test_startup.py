@@ -0,0 +1,54 @@
+import os
+import sys
+import asyncio
+import threading
+import subprocess
+
+from modules.startup import LazyService
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("av", "openai", "pyicloud", "aiortc")
+
+
+def test_importing_main_loads_no_heavy_modules(tmp_path):
+    env = dict(
+        os.environ,
+        RECORDINGS_BASE_PATH=str(tmp_path / "cctv"),
+        RECORDINGS_DB_PATH=str(tmp_path / "recordings.db"),
+        THUMBNAIL_CACHE_DIR=str(tmp_path / "thumbnails"),
+        STATS_HISTORY_PATH="",
+    )
+    code = f"import sys, main; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    # letzte Zeile ist die Liste der geladenen schweren Module
+    assert result.stdout.splitlines()[-1] == ""
+
+
+def test_lazy_service_creates_once():
+    calls = []
+    barrier = threading.Barrier(8)
+
+    def factory():
+        calls.append(1)
+        return object()
+
+    service = LazyService("test", factory)
+    assert service.instance is None
+
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(service.get())
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert all(result is service.instance for result in results)
+    assert asyncio.run(service.aget()) is service.instance
@@ -0,0 +1,36 @@
+import pytest
+
+from modules.video_stream import MAX_RANGES, RangeNotSatisfiable, parse_range_header
+
+
+def test_single_range():
+    assert parse_range_header("bytes=0-99", 1000) == [(0, 99)]
+
+
+def test_open_end_and_clamped_end():
+    assert parse_range_header("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=900-5000", 1000) == [(900, 999)]
+
+
+def test_suffix_range():
+    assert parse_range_header("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range_header("bytes=-5000", 1000) == [(0, 999)]
+
+
+def test_overlapping_and_adjacent_ranges_are_merged():
+    assert parse_range_header("bytes=0-10, 5-20, 21-30, 50-60", 1000) == [(0, 30), (50, 60)]
+
+
+@pytest.mark.parametrize("header", ["items=0-1", "bytes=", "bytes=abc-1", "bytes=10-5", "bytes=5"])
+def test_invalid_headers_are_ignored(header):
+    assert parse_range_header(header, 1000) is None
+
+
+def test_too_many_ranges_are_ignored():
+    header = "bytes=" + ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(MAX_RANGES + 1))
+    assert parse_range_header(header, 10_000) is None
+
+
+def test_range_outside_file_is_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header("bytes=1000-", 1000)